@@ -1,15 +1,42 @@
+import os
+import time
+
+_import_started = time.perf_counter()
+
 from flask import Flask, jsonify, make_response
 from flask_marshmallow import Marshmallow
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from http import HTTPStatus
 
 from .config import config
+from .cache import MessageCache
+from .coalescing import WriteCoalescer
+from .compression import Compression
+from .enrichment import Enricher
+from .metrics import Metrics
+from .profiler import Profiler
+from .routing import RoutingSQLAlchemy
+from .startup import StartupProfile
 
 
-db = SQLAlchemy()
+_import_seconds = time.perf_counter() - _import_started
+
+db = RoutingSQLAlchemy()
 ma = Marshmallow()
-mg = Migrate()
+cache = MessageCache()
+enricher = Enricher()
+coalescer = WriteCoalescer()
+metrics = Metrics()
+profiler = Profiler()
+compression = Compression()
+
+
+def _migrations_enabled(app):
+    # alembic is only needed by the `flask db` commands, auto-detected
+    # unless DB_MIGRATIONS is set
+    enabled = app.config.get('DB_MIGRATIONS')
+    if enabled is None:
+        return os.environ.get('FLASK_RUN_FROM_CLI') == 'true'
+    return enabled
 
 
 def create_app(config_name):
@@ -21,34 +48,63 @@ def create_app(config_name):
         app.config.from_object(config[config_name])
         config[config_name].init_app(app)
 
-        db.init_app(app)
-        ma.init_app(app)
-        mg.init_app(app, db)
+        profile = StartupProfile(app.config.get('STARTUP_PROFILE'))
+        profile.record('imports', _import_seconds)
+        app.extensions['startup_profile'] = profile
+
+        with profile.step('db'):
+            db.init_app(app)
+        with profile.step('marshmallow'):
+            ma.init_app(app)
+        if _migrations_enabled(app):
+            with profile.step('migrate'):
+                from flask_migrate import Migrate
+                Migrate(app, db)
+        with profile.step('cache'):
+            cache.init_app(app)
+        with profile.step('enricher'):
+            enricher.init_app(app)
+        with profile.step('coalescer'):
+            coalescer.init_app(app)
+        with profile.step('metrics'):
+            metrics.init_app(app, db)
+        with profile.step('profiler'):
+            profiler.init_app(app)
+        # after the metrics and the profiler: its after_request runs before
+        # theirs, they see the compressed response
+        with profile.step('compression'):
+            compression.init_app(app)
 
         app.logger.info('Initializing webservice')
 
         @app.route('/api/v1/healthcheck', methods=['GET'])
         def healthcheck():
             return make_response(jsonify(status='healthy'), HTTPStatus.OK)
-       
+
         try:
-            from .main import main as main_blueprint
-            app.register_blueprint(main_blueprint)
+            with profile.step('blueprints'):
+                from .main import main as main_blueprint
+                app.register_blueprint(main_blueprint)
 
-            from .api import api as api_blueprint
-            app.register_blueprint(api_blueprint, url_prefix='/api/v1')
+                from .api import api as api_blueprint
+                app.register_blueprint(api_blueprint, url_prefix='/api/v1')
 
-            from .api import swaggerui_manager
-            app.register_blueprint(swaggerui_manager)
+            # the OpenAPI document itself is built on its first request
+            if app.config['API_DOCS']:
+                with profile.step('swagger_ui'):
+                    from .api import swaggerui_blueprint
+                    app.register_blueprint(swaggerui_blueprint())
 
-            from .api import spec
-            for fn in app.view_functions:
-                spec.path(view=app.view_functions[fn])
+            with profile.step('cli'):
+                from .commands import messages_cli, openapi_command
+                app.cli.add_command(messages_cli)
+                app.cli.add_command(openapi_command)
 
         except:
             app.logger.exception('Failed to initialize webservice')
             raise
-    
+
+    profile.report(app.logger)
     app.logger.info('Webservice Initialized')
 
     return app
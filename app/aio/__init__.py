@@ -0,0 +1,117 @@
+import sys
+import logging
+from http import HTTPStatus
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+from ..cache import redis_backend
+from ..config import config
+from ..exceptions import WebserviceException
+
+
+# asyncio drivers of the DBAPIs used by the WSGI app
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'mysql+pymysql': 'mysql+aiomysql',
+}
+
+
+def create_engine(settings):
+    url = make_url(settings.get('SQLALCHEMY_ASYNC_DATABASE_URI')
+                   or settings['SQLALCHEMY_DATABASE_URI'])
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+    options = {}
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            # a single connection, otherwise every connection gets its own database
+            options['poolclass'] = StaticPool
+    elif url.get_backend_name() == 'mysql':
+        url = url.update_query_dict({'charset': 'utf8'})
+        options.update(pool_size=10, pool_recycle=7200)
+
+    return create_async_engine(url, **options)
+
+
+def create_cache(settings):
+    """The message cache shared with the WSGI workers, which the writes of
+    this app invalidate, None unless MESSAGE_CACHE_BACKEND is redis or a
+    backend instance: a 'local' one only lives in the WSGI processes."""
+    backend = settings.get('MESSAGE_CACHE_BACKEND')
+    if backend == 'redis':
+        return redis_backend(settings['MESSAGE_CACHE_URL'], settings['MESSAGE_CACHE_TTL'])
+    if backend is None or isinstance(backend, str):
+        return None
+    return backend
+
+
+async def healthcheck(request):
+    return JSONResponse({'status': 'healthy'}, status_code=HTTPStatus.OK)
+
+
+async def webservice_exception(request, err):
+    return JSONResponse({'error': err.message}, status_code=err.code)
+
+
+async def url_not_found(request, err):
+    return JSONResponse({'error': 'not found'}, status_code=HTTPStatus.NOT_FOUND)
+
+
+async def method_not_found(request, err):
+    return JSONResponse({'error': 'method not allowed'},
+                        status_code=HTTPStatus.METHOD_NOT_ALLOWED)
+
+
+async def internal_server_error(request, err):
+    logging.getLogger(request.app.state.config['LOGGER_NAME']).exception('Exception')
+    return JSONResponse({'error': 'internal server error'},
+                        status_code=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+
+def create_asgi_app(config_name):
+    """application factory function for the asyncio serving mode, it serves
+    the /api/v1/messages contract with an async SQLAlchemy engine"""
+
+    cfg = config[config_name]
+    settings = {key: getattr(cfg, key) for key in dir(cfg) if key.isupper()}
+
+    logger = logging.getLogger(settings['LOGGER_NAME'])
+    logger.setLevel(settings['LOG_LEVEL'])
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setLevel(settings['LOG_LEVEL'])
+        logger.addHandler(handler)
+
+    logger.info('Initializing webservice')
+
+    from .messages import routes
+    engine = create_engine(settings)
+    middleware = [Middleware(GZipMiddleware, minimum_size=settings['COMPRESSION_MIN_SIZE'])] \
+        if settings['COMPRESSION_ENABLED'] else []
+    app = Starlette(
+        middleware=middleware,
+        routes=[
+            Route('/api/v1/healthcheck', healthcheck, methods=['GET']),
+            Mount('/api/v1', routes=routes),
+        ],
+        exception_handlers={
+            WebserviceException: webservice_exception,
+            HTTPStatus.NOT_FOUND: url_not_found,
+            HTTPStatus.METHOD_NOT_ALLOWED: method_not_found,
+            Exception: internal_server_error,
+        },
+        on_shutdown=[engine.dispose],
+    )
+    app.state.config = settings
+    app.state.engine = engine
+    app.state.cache = create_cache(settings)
+
+    logger.info('Webservice Initialized')
+
+    return app
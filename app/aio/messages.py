@@ -0,0 +1,363 @@
+import json
+import logging
+from datetime import datetime, timezone
+from http import HTTPStatus
+from urllib.parse import urlencode
+from sqlalchemy import select
+from sqlalchemy.orm import load_only
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.http import http_date, parse_date, parse_etags, quote_etag
+
+from ..api.conditional import make_etag, represented, is_fresh, last_modified_of, VALIDATOR_FIELDS
+from ..api.params import encode_cursor, decode_cursor, encode_offset_cursor, \
+    decode_offset_cursor, parse_limit, parse_palindrome, parse_search, parse_ids, is_id_list, \
+    parse_fields
+from ..enrichment import enrichment_update, enrichment_params
+from ..exceptions import WebserviceException
+from ..models import Message, MessageResponseSchema, MessageRequestSchema, is_palindrome, \
+    content_values
+from ..repository import search_select, _select
+
+
+def _session(request):
+    return AsyncSession(request.app.state.engine, expire_on_commit=False)
+
+
+def _logger(request):
+    return logging.getLogger(request.app.state.config['LOGGER_NAME'])
+
+
+async def _json_body(request):
+    body = await request.body()
+    if not body:
+        raise WebserviceException(
+            message='Request body cannot be empty.',
+            code=HTTPStatus.BAD_REQUEST
+        )
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise WebserviceException(
+            message='Request body must be valid JSON.',
+            code=HTTPStatus.BAD_REQUEST
+        )
+
+
+def _url(request, **params):
+    return '{}?{}'.format(request.app.url_path_for('get_messages'), urlencode(params))
+
+
+def _validated(response, etag, last_modified=None):
+    response.headers['ETag'] = quote_etag(etag)
+    if last_modified:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _not_modified(request, etag, last_modified=None):
+    if_none_match = request.headers.get('if-none-match')
+    if_modified_since = request.headers.get('if-modified-since')
+    if not is_fresh(parse_etags(if_none_match) if if_none_match else None,
+                    parse_date(if_modified_since), etag, last_modified):
+        return None
+    return _validated(Response(status_code=HTTPStatus.NOT_MODIFIED), etag, last_modified)
+
+
+async def _invalidate(cache, id):
+    """Drops a message from the cache shared with the WSGI workers, after
+    the commit of its write."""
+    if cache is not None:
+        # a blocking client, kept off the event loop
+        await run_in_threadpool(cache.delete, id)
+
+
+async def _enrich(engine, cache, id, content):
+    async with engine.begin() as conn:
+        await conn.execute(enrichment_update(), [enrichment_params(id, content)])
+    await _invalidate(cache, id)
+
+
+def _enrichment(request, msg):
+    """Computes the longest palindrome of a message once its response is sent."""
+    if request.app.state.config['ENRICHMENT_MODE'] == 'off':
+        return None
+    return BackgroundTask(_enrich, request.app.state.engine, request.app.state.cache,
+                          msg.id, msg.content)
+
+
+def _messages(fields=None):
+    query = select(Message)
+    if fields:
+        # the id is always loaded, the cursors are made of it
+        query = query.options(load_only(*dict.fromkeys(('id',) + fields)))
+    return query
+
+
+def _filtered(palindrome, fields=None):
+    query = _messages(fields)
+    if palindrome is not None:
+        query = query.where(Message.palindrome == palindrome)
+    return query
+
+
+async def _find_by_id(session, id, fields=None):
+    result = await session.execute(_messages(fields).where(Message.id == id))
+    return result.scalars().first()
+
+
+async def create_message(request):
+    data = await _json_body(request)
+    err = MessageRequestSchema().validate(data)
+    if err:
+        return JSONResponse({'errors': err}, status_code=HTTPStatus.BAD_REQUEST)
+
+    async with _session(request) as session:
+        msg = Message(content=data['content'], palindrome=is_palindrome(data['content']))
+        session.add(msg)
+        await session.commit()
+        await session.refresh(msg)
+
+    result = MessageResponseSchema().dump(msg)
+    _logger(request).debug('Message created: {}'.format(result))
+
+    return JSONResponse({'message': result}, status_code=HTTPStatus.CREATED,
+                        background=_enrichment(request, msg))
+
+
+async def get_message(request):
+    id = request.path_params['id']
+    fields = parse_fields(request.query_params.get('fields'))
+    async with _session(request) as session:
+        msg = await _find_by_id(session, id, fields and fields + VALIDATOR_FIELDS)
+    if not msg:
+        return JSONResponse({'error': 'Message Not found'}, status_code=HTTPStatus.BAD_REQUEST)
+
+    etag = make_etag(represented([msg], fields))
+    last_modified = last_modified_of(msg, fields)
+    resp = _not_modified(request, etag, last_modified)
+    if resp:
+        return resp
+
+    _logger(request).debug('Message with id={} retrieved.'.format(id))
+    resp = JSONResponse({'message': MessageResponseSchema(only=fields).dump(msg)},
+                        status_code=HTTPStatus.OK)
+    return _validated(resp, etag, last_modified)
+
+
+async def _lookup(request, ids):
+    settings = request.app.state.config
+    if len(ids) > settings['MESSAGES_MAX_BATCH_SIZE']:
+        raise WebserviceException(
+            message='Cannot request more than {} ids.'
+                .format(settings['MESSAGES_MAX_BATCH_SIZE']),
+            code=HTTPStatus.BAD_REQUEST
+        )
+
+    fields = parse_fields(request.query_params.get('fields'))
+    ids = list(dict.fromkeys(ids))
+    async with _session(request) as session:
+        result = await session.execute(_messages(fields).where(Message.id.in_(ids))) \
+            if ids else None
+        found = {msg.id: msg for msg in result.scalars()} if result else {}
+    msgs = [found[id] for id in ids if id in found]
+    missing = [id for id in ids if id not in found]
+
+    etag = make_etag(represented(msgs, fields), missing)
+    if request.method == 'GET':
+        resp = _not_modified(request, etag)
+        if resp:
+            return resp
+
+    schema = MessageResponseSchema(only=fields)
+    resp = JSONResponse({
+        'messages': [schema.dump(msg) for msg in msgs],
+        'missing': missing
+    }, status_code=HTTPStatus.OK)
+    return _validated(resp, etag)
+
+
+async def get_messages(request):
+    args = request.query_params
+    settings = request.app.state.config
+    if 'ids' in args:
+        return await _lookup(request, parse_ids(args['ids']))
+
+    palindrome = parse_palindrome(args.get('palindrome'))
+    fields = parse_fields(args.get('fields'))
+    filters = {'palindrome': args['palindrome']} if palindrome is not None else {}
+    if fields:
+        filters['fields'] = ','.join(fields)
+    schema = MessageResponseSchema(only=fields)
+
+    if 'q' in args:
+        terms = parse_search(args['q'])
+        cursor = args.get('cursor')
+        offset = decode_offset_cursor(cursor) if cursor else 0
+        limit = parse_limit(args.get('limit'),
+                            settings['MESSAGES_PER_PAGE'], settings['MESSAGES_MAX_PER_PAGE'])
+        engine = request.app.state.engine
+        query = search_select(engine.dialect.name, terms, offset, limit, palindrome, fields)
+        async with _session(request) as session:
+            msgs = (await session.execute(query)).all()
+        msgs, has_next = msgs[:limit], len(msgs) > limit
+
+        etag = make_etag(represented(msgs, fields), has_next, offset, limit)
+        resp = _not_modified(request, etag)
+        if resp:
+            return resp
+
+        resp = {'messages': [schema.dump(msg) for msg in msgs]}
+        if has_next:
+            next_cursor = encode_offset_cursor(offset + limit)
+            resp.update({
+                'next_cursor': next_cursor,
+                'next_url': _url(request, q=args['q'], cursor=next_cursor, limit=limit, **filters)
+            })
+        return _validated(JSONResponse(resp, status_code=HTTPStatus.OK), etag)
+
+    if 'page' not in args:
+        cursor = args.get('cursor')
+        last_id = decode_cursor(cursor) if cursor else None
+        limit = parse_limit(args.get('limit'),
+                            settings['MESSAGES_PER_PAGE'], settings['MESSAGES_MAX_PER_PAGE'])
+        query = _filtered(palindrome, fields).order_by(Message.id).limit(limit + 1)
+        if last_id is not None:
+            query = query.where(Message.id > last_id)
+        async with _session(request) as session:
+            msgs = (await session.execute(query)).scalars().all()
+        msgs, has_next = msgs[:limit], len(msgs) > limit
+
+        etag = make_etag(represented(msgs, fields), has_next, limit)
+        resp = _not_modified(request, etag)
+        if resp:
+            return resp
+
+        resp = {'messages': [schema.dump(msg) for msg in msgs]}
+        if has_next:
+            next_cursor = encode_cursor(msgs[-1].id)
+            resp.update({
+                'next_cursor': next_cursor,
+                'next_url': _url(request, cursor=next_cursor, limit=limit, **filters)
+            })
+        return _validated(JSONResponse(resp, status_code=HTTPStatus.OK), etag)
+
+    try:
+        page = max(int(args['page']), 1)
+    except ValueError:
+        page = 1
+    per_page = settings['MESSAGES_PER_PAGE']
+    query = _filtered(palindrome, fields).order_by(Message.id) \
+        .offset((page - 1) * per_page).limit(per_page + 1)
+    async with _session(request) as session:
+        msgs = (await session.execute(query)).scalars().all()
+    msgs, has_next, has_prev = msgs[:per_page], len(msgs) > per_page, page > 1
+
+    etag = make_etag(represented(msgs, fields), has_next, has_prev)
+    resp = _not_modified(request, etag)
+    if resp:
+        return resp
+
+    resp = {'messages': [schema.dump(msg) for msg in msgs]}
+    if has_next:
+        resp.update({'next_url': _url(request, page=page + 1, **filters)})
+    if has_prev:
+        resp.update({'prev_url': _url(request, page=page - 1, **filters)})
+    return _validated(JSONResponse(resp, status_code=HTTPStatus.OK), etag)
+
+
+async def lookup_messages(request):
+    data = await _json_body(request)
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not is_id_list(ids):
+        return JSONResponse({'errors': {'ids': ['Must be a list of message ids.']}},
+                            status_code=HTTPStatus.BAD_REQUEST)
+    return await _lookup(request, ids)
+
+
+async def export_messages(request):
+    args = request.query_params
+    try:
+        since_id = int(args['since_id']) if 'since_id' in args else None
+        since_modified = datetime.fromisoformat(args['since_modified']) \
+            if 'since_modified' in args else None
+    except ValueError:
+        raise WebserviceException(
+            message='since_id must be an integer and since_modified an ISO 8601 datetime.',
+            code=HTTPStatus.BAD_REQUEST
+        )
+    if since_modified is not None and since_modified.tzinfo is not None:
+        since_modified = since_modified.astimezone(timezone.utc).replace(tzinfo=None)
+
+    fields = parse_fields(args.get('fields'))
+
+    table = Message.__table__
+    query = _select(fields=fields).order_by(table.c.id)
+    if since_id is not None:
+        query = query.where(table.c.id > since_id)
+    if since_modified is not None:
+        query = query.where(table.c.date_modified >= since_modified)
+
+    async def generate():
+        schema = MessageResponseSchema(only=fields)
+        async with request.app.state.engine.connect() as conn:
+            result = await conn.stream(query)
+            async for row in result:
+                yield json.dumps(schema.dump(row), separators=(',', ':')) + '\n'
+
+    return StreamingResponse(generate(), status_code=HTTPStatus.OK,
+                             media_type='application/x-ndjson')
+
+
+async def update_message(request):
+    id = request.path_params['id']
+    data = await _json_body(request)
+    err = MessageRequestSchema().validate(data)
+    if err:
+        return JSONResponse({'errors': err}, status_code=HTTPStatus.BAD_REQUEST)
+
+    # a single UPDATE, the row is read back in the same transaction
+    table = Message.__table__
+    async with request.app.state.engine.begin() as conn:
+        result = await conn.execute(
+            table.update().where(table.c.id == id).values(**content_values(data['content'])))
+        msg = (await conn.execute(_select().where(table.c.id == id))).first() \
+            if result.rowcount else None
+    if not msg:
+        return JSONResponse({'error': 'Message Not found'},
+                            status_code=HTTPStatus.BAD_REQUEST)
+    await _invalidate(request.app.state.cache, id)
+
+    _logger(request).debug('Message with id={} updated.'.format(id))
+
+    return JSONResponse({'message': MessageResponseSchema().dump(msg)},
+                        status_code=HTTPStatus.OK, background=_enrichment(request, msg))
+
+
+async def delete_message(request):
+    id = request.path_params['id']
+    table = Message.__table__
+    async with request.app.state.engine.begin() as conn:
+        result = await conn.execute(table.delete().where(table.c.id == id))
+    if not result.rowcount:
+        return JSONResponse({'error': 'Message Not found'},
+                            status_code=HTTPStatus.BAD_REQUEST)
+    await _invalidate(request.app.state.cache, id)
+
+    _logger(request).debug('Message with id={} deleted.'.format(id))
+
+    return Response(status_code=HTTPStatus.NO_CONTENT)
+
+
+routes = [
+    Route('/messages', get_messages, methods=['GET']),
+    Route('/messages', create_message, methods=['POST']),
+    Route('/messages/export', export_messages, methods=['GET']),
+    Route('/messages/lookup', lookup_messages, methods=['POST']),
+    Route('/messages/{id:int}', get_message, methods=['GET']),
+    Route('/messages/{id:int}', update_message, methods=['PUT']),
+    Route('/messages/{id:int}', delete_message, methods=['DELETE']),
+]
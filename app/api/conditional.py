@@ -0,0 +1,72 @@
+import hashlib
+from datetime import timezone
+from http import HTTPStatus
+from flask import request
+from flask import current_app as app
+
+from ..compression import COMPRESSORS
+from ..models import MessageResponseSchema
+
+
+def make_etag(*parts):
+    """Strong validator for a representation, derived from the values that
+    are serialized so it can be checked before serializing them."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def represented(msgs, fields=None):
+    """The values of `msgs` that end up in their representation, only
+    `fields` of them, named, for a sparse one."""
+    values = [tuple(getattr(msg, field) for field in fields or MessageResponseSchema.Meta.fields)
+              for msg in msgs]
+    return values if fields is None else [fields] + values
+
+
+# the columns a representation needs on top of its fields for its validators
+VALIDATOR_FIELDS = ('date_modified', 'longest_palindrome_start')
+ENRICHMENT_FIELDS = ('longest_palindrome', 'longest_palindrome_start', 'longest_palindrome_end')
+
+
+def last_modified_of(msg, fields=None):
+    """The Last-Modified date of the representation of `msg`, None while it
+    shows enrichment values that are not computed yet: the enrichment
+    changes the body, possibly within the second of the date a client
+    already holds."""
+    if any(field in ENRICHMENT_FIELDS for field in fields or ENRICHMENT_FIELDS) and \
+            msg.longest_palindrome_start is None:
+        return None
+    return msg.date_modified
+
+
+def _utc_naive(dt):
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.replace(microsecond=0)
+
+
+def is_fresh(if_none_match, if_modified_since, etag, last_modified=None):
+    """Whether the client already holds this representation according to
+    its If-None-Match (parsed ETags) / If-Modified-Since (datetime)."""
+    if if_none_match:
+        # or one of its compressed variants
+        return any(if_none_match.contains_weak(variant) for variant in
+                   [etag] + ['{}-{}'.format(etag, encoding) for encoding in COMPRESSORS])
+    if if_modified_since and last_modified:
+        return _utc_naive(last_modified) <= _utc_naive(if_modified_since)
+    return False
+
+
+def not_modified(etag, last_modified=None):
+    """Returns a 304 response if the client already holds this
+    representation, otherwise None."""
+    if not is_fresh(request.if_none_match, request.if_modified_since, etag, last_modified):
+        return None
+    return set_validators(
+        app.response_class(status=HTTPStatus.NOT_MODIFIED), etag, last_modified)
+
+
+def set_validators(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    return response
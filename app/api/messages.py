@@ -1,19 +1,86 @@
-import json
+from datetime import datetime, timezone
 from http import HTTPStatus
-from flask import jsonify, request, url_for
+from flask import jsonify, request, url_for, stream_with_context
 from flask import current_app as app
+from werkzeug.http import http_date, parse_date
 
-from . import api, spec
+from . import api
+from .openapi import spec_document
+from .conditional import make_etag, represented, not_modified, set_validators, \
+    last_modified_of, VALIDATOR_FIELDS
+from .params import encode_cursor, decode_cursor, encode_offset_cursor, \
+    decode_offset_cursor, parse_limit, parse_palindrome, parse_search, parse_ids, is_id_list, \
+    parse_fields
+from .. import cache, coalescer, compression, db, repository
 from ..exceptions import WebserviceException
-from ..models import Message, MessageResponseSchema, MessageRequestSchema
+from ..models import Message, MessageRequestSchema, MessageBatchUpdateSchema
+from ..importer import import_messages
+from ..profiler import phase
+from ..serializers import get_serializer, encode_list, encode_object, json_response
 
 
-spec.components.schema("MessageRequestSchema", schema=MessageRequestSchema)
-spec.components.schema("MessageResponseSchema", schema=MessageResponseSchema)
+def _lookup(ids):
+    if len(ids) > app.config['MESSAGES_MAX_BATCH_SIZE']:
+        raise WebserviceException(
+            message='Cannot request more than {} ids.'
+                .format(app.config['MESSAGES_MAX_BATCH_SIZE']),
+            code=HTTPStatus.BAD_REQUEST
+        )
+
+    fields = parse_fields(request.args.get('fields'))
+    ids = list(dict.fromkeys(ids))
+    found = repository.find_by_ids(ids, fields)
+    msgs = [found[id] for id in ids if id in found]
+    missing = [id for id in ids if id not in found]
+
+    etag = make_etag(represented(msgs, fields), missing)
+    if request.method == 'GET':
+        resp = not_modified(etag)
+        if resp:
+            return resp
+
+    serializer = get_serializer(fields)
+    with phase('serialize'):
+        messages = encode_list(serializer.dumps(msg) for msg in msgs)
+    resp = json_response(HTTPStatus.OK, {'messages': messages}, missing=missing)
+    return set_validators(resp, etag)
+
 
 @api.route('/swagger.json', methods=['GET'])
 def swagger_spec():
-    return jsonify(spec.to_dict())
+    if not app.config['API_DOCS']:
+        raise WebserviceException(message='Not found.', code=HTTPStatus.NOT_FOUND)
+
+    body, etag = spec_document(app)
+    resp = not_modified(etag)
+    if resp:
+        return resp
+    resp = app.response_class(body, status=HTTPStatus.OK, mimetype=app.config['JSONIFY_MIMETYPE'])
+    resp.cache_control.public = True
+    resp.cache_control.max_age = app.config['API_DOCS_MAX_AGE']
+    return compression.static(set_validators(resp, etag), ('openapi', etag))
+
+@api.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    ---
+    get:
+      description: Requests the hit and miss counters of the message cache of this process
+      responses:
+        200:
+          description: Returns the cache counters
+          content:
+            application/json:
+              example: {
+                hits: 0,
+                misses: 0,
+                size: 0
+              }
+      tags:
+        - cache
+    """
+    return jsonify(cache.stats()), HTTPStatus.OK
+
 
 @api.route('/messages', methods=['POST'])
 def create_message():
@@ -50,21 +117,143 @@ def create_message():
             code=HTTPStatus.BAD_REQUEST
         )
 
-    data = request.get_json()
-    schema = MessageRequestSchema()
-    err = schema.validate(data)
+    with phase('parse'):
+        data = request.get_json()
+    with phase('validate'):
+        err = MessageRequestSchema().validate(data)
     if err:
         return jsonify(errors=err), HTTPStatus.BAD_REQUEST
     
-    msg = Message()
-    msg.content = data['content']
-    msg.add_or_update()
+    if coalescer.enabled:
+        msg = coalescer.create(data['content'])
+    else:
+        msg = Message()
+        msg.content = data['content']
+        msg.add_or_update()
 
-    schema = MessageResponseSchema()
-    result = schema.dump(msg)
+    with phase('serialize'):
+        result = get_serializer().dumps(msg)
     app.logger.debug('Message created: {}'.format(result))
 
-    return jsonify(message=result), HTTPStatus.CREATED
+    return json_response(HTTPStatus.CREATED, {'message': result})
+
+
+@api.route('/messages/batch', methods=['POST'])
+def batch_messages():
+    """
+    ---
+    post:
+      description: Creates, updates and deletes many Messages in a single transaction
+      requestBody:
+        required: true
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                create:
+                  type: array
+                  items:
+                    $ref: '#/components/schemas/MessageRequestSchema'
+                update:
+                  type: array
+                  items:
+                    $ref: '#/components/schemas/MessageBatchUpdateSchema'
+                delete:
+                  type: array
+                  items:
+                    type: integer
+      responses:
+        200:
+          description: Returns the result of every item, in request order
+          content:
+            application/json:
+              example: {
+                created: [{status: 201, message: {id: 0, content: string, palindrome: false}}],
+                updated: [{id: 0, status: 200, message: {id: 0, content: string, palindrome: false}}],
+                deleted: [{id: 1, status: 400, error: Message Not found}]
+              }
+      tags:
+        - messages
+    """
+    if not request.data:
+        raise WebserviceException(
+            message='Request body cannot be empty.', 
+            code=HTTPStatus.BAD_REQUEST
+        )
+
+    with phase('parse'):
+        data = request.get_json()
+    if not isinstance(data, dict):
+        raise WebserviceException(
+            message='Request body must be an object.',
+            code=HTTPStatus.BAD_REQUEST
+        )
+
+    creates = data.get('create', [])
+    updates = data.get('update', [])
+    deletes = data.get('delete', [])
+
+    # checked first, the limit also bounds the cost of the validation
+    size = sum(len(items) for items in (creates, updates, deletes) if isinstance(items, list))
+    if size > app.config['MESSAGES_MAX_BATCH_SIZE']:
+        raise WebserviceException(
+            message='Batch cannot contain more than {} items.'
+                .format(app.config['MESSAGES_MAX_BATCH_SIZE']),
+            code=HTTPStatus.BAD_REQUEST
+        )
+
+    err = {}
+    with phase('validate'):
+        create_err = MessageRequestSchema(many=True).validate(creates)
+        if create_err:
+            err['create'] = create_err
+        update_err = MessageBatchUpdateSchema(many=True).validate(updates)
+        if update_err:
+            err['update'] = update_err
+        if not is_id_list(deletes):
+            err['delete'] = ['Must be a list of message ids.']
+    if err:
+        return jsonify(errors=err), HTTPStatus.BAD_REQUEST
+
+    if set(item['id'] for item in updates) & set(deletes):
+        raise WebserviceException(
+            message='A message cannot be updated and deleted in the same batch.',
+            code=HTTPStatus.BAD_REQUEST
+        )
+
+    created, updated, deleted = Message.bulk_write(
+        creates=[item['content'] for item in creates],
+        updates={item['id']: item['content'] for item in updates},
+        deletes=deletes
+    )
+    app.logger.debug('Batch applied: {} created, {} updated, {} deleted.'
+                     .format(len(created), len(updated), len(deleted)))
+
+    serializer = get_serializer()
+    deleted = set(deleted)
+    with phase('serialize'):
+        resp = {
+            'created': encode_list(
+                encode_object({'message': serializer.dumps(msg)}, status=HTTPStatus.CREATED)
+                for msg in created
+            ),
+            'updated': encode_list(
+                encode_object({'message': serializer.dumps(updated[item['id']])},
+                              id=item['id'], status=HTTPStatus.OK)
+                if item['id'] in updated else
+                encode_object(id=item['id'], status=HTTPStatus.BAD_REQUEST, error='Message Not found')
+                for item in updates
+            ),
+            'deleted': encode_list(
+                encode_object(id=id, status=HTTPStatus.NO_CONTENT)
+                if id in deleted else
+                encode_object(id=id, status=HTTPStatus.BAD_REQUEST, error='Message Not found')
+                for id in deletes
+            ),
+        }
+
+    return json_response(HTTPStatus.OK, resp)
 
 
 @api.route('/messages/<int:id>', methods=['GET'])
@@ -78,6 +267,10 @@ def get_message(id):
         in: path
         required: true
         description: The id of the message to request
+      - name: fields
+        in: query
+        required: false
+        description: Comma separated list of the message fields to return, all of them by default
       responses:
         200:
           description: Returns the message
@@ -98,14 +291,45 @@ def get_message(id):
       tags:
         - messages
     """
-    msg = Message.find_by_id(id)
-    if not msg:
+    fields = parse_fields(request.args.get('fields'))
+    # the cache holds the full representation only
+    entry = _serialize_message(id, fields) if fields else \
+        cache.get_or_load(id, lambda: _load_message(id))
+    if entry is None:
         return jsonify(error='Message Not found'), HTTPStatus.BAD_REQUEST
-  
-    schema = MessageResponseSchema()
-    app.logger.debug('Message with id={} retrieved.'.format(msg.id))
 
-    return jsonify(message=schema.dump(msg)), HTTPStatus.OK
+    payload, etag, last_modified = entry
+    last_modified = parse_date(last_modified) if last_modified else None
+    resp = not_modified(etag, last_modified)
+    if resp:
+        return resp
+
+    app.logger.debug('Message with id={} retrieved.'.format(id))
+
+    resp = json_response(HTTPStatus.OK, {'message': payload})
+    return set_validators(resp, etag, last_modified)
+
+
+def _load_message(id):
+    if not cache.enabled:
+        return _serialize_message(id)
+    # cached entries outlive the replication lag, so fill them from the primary
+    with db.primary():
+        return _serialize_message(id)
+
+
+def _serialize_message(id, fields=None):
+    """Returns the cache entry of a message: its serialized form and its
+    validators."""
+    msg = repository.find_by_id(id, fields and fields + VALIDATOR_FIELDS)
+    if not msg:
+        return None
+    with phase('serialize'):
+        payload = get_serializer(fields).dumps(msg)
+    etag = make_etag(represented([msg], fields))
+    last_modified = last_modified_of(msg, fields)
+    last_modified = http_date(last_modified) if last_modified else None
+    return payload, etag, last_modified
 
 
 @api.route('/messages', methods=['GET'])
@@ -115,16 +339,41 @@ def get_messages():
     get:
       description: Requests a Message
       parameters:
+      - name: cursor
+        in: query
+        required: false
+        description: Opaque cursor returned as next_cursor by the previous page
+      - name: limit
+        in: query
+        required: false
+        description: Number of messages per page (capped at 100)
       - name: page
         in: query
         required: false
-        description: Supports pagination (10 messages per page)
+        description: Legacy offset pagination (10 messages per page)
+      - name: palindrome
+        in: query
+        required: false
+        description: Only returns messages that are (true) or are not (false) palindromes
+      - name: ids
+        in: query
+        required: false
+        description: Comma separated list of ids to fetch in a single call, missing ids are listed in missing
+      - name: q
+        in: query
+        required: false
+        description: Full-text search, returns the messages containing all the words, best matches first
+      - name: fields
+        in: query
+        required: false
+        description: Comma separated list of the message fields to return, all of them by default
       responses:
         200:
           description: Returns messages
           content:
             application/json:
               example: {
+                next_cursor: string,
                 next_url: url,
                 prev_ur: url,
                 messages:[
@@ -138,6 +387,8 @@ def get_messages():
               schema:
                 type: object
                 properties:
+                  next_cursor:
+                    type: string
                   next_url:
                     type: string
                   prev_url:
@@ -149,22 +400,281 @@ def get_messages():
       tags:
         - messages
     """
-    page = request.args.get('page', 1, type=int)
-    msgs = Message.find_all(page)
-    schema = MessageResponseSchema()
+    if 'ids' in request.args:
+        return _lookup(parse_ids(request.args['ids']))
 
-    next_url = url_for('api.get_messages', page=msgs.next_num) \
-        if msgs.has_next else None
-    prev_url = url_for('api.get_messages', page=msgs.prev_num) \
-        if msgs.has_prev else None
+    if 'q' in request.args:
+        return _search_messages()
+
+    if 'page' not in request.args:
+        return _get_messages_after()
+
+    with phase('parse'):
+        page = max(request.args.get('page', 1, type=int), 1)
+        palindrome = parse_palindrome(request.args.get('palindrome'))
+        fields = parse_fields(request.args.get('fields'))
+    msgs, has_next, has_prev = repository.find_page(
+        page, app.config['MESSAGES_PER_PAGE'], palindrome, fields)
+
+    etag = make_etag(represented(msgs, fields), has_next, has_prev)
+    resp = not_modified(etag)
+    if resp:
+        return resp
+
+    serializer = get_serializer(fields)
+
+    filters = _filters(palindrome, fields)
+    next_url = url_for('api.get_messages', page=page + 1, **filters) \
+        if has_next else None
+    prev_url = url_for('api.get_messages', page=page - 1, **filters) \
+        if has_prev else None
     
-    resp = {'messages': [schema.dump(msg) for msg in msgs.items]}
+    resp = {}
     if next_url:
         resp.update({'next_url': next_url})
     if prev_url:
         resp.update({'prev_url': prev_url})
 
-    return jsonify(resp), HTTPStatus.OK
+    with phase('serialize'):
+        messages = encode_list(serializer.dumps(msg) for msg in msgs)
+    return set_validators(json_response(HTTPStatus.OK, {'messages': messages}, **resp), etag)
+
+
+def _filters(palindrome, fields):
+    """The query parameters of a page carried over to the next one."""
+    filters = {}
+    if palindrome is not None:
+        filters['palindrome'] = request.args['palindrome']
+    if fields:
+        filters['fields'] = ','.join(fields)
+    return filters
+
+
+def _get_messages_after():
+    """Keyset pagination: seeks on the primary key so that every page costs
+    the same no matter how deep it is."""
+    with phase('parse'):
+        cursor = request.args.get('cursor')
+        last_id = decode_cursor(cursor) if cursor else None
+        limit = parse_limit(request.args.get('limit'), app.config['MESSAGES_PER_PAGE'],
+                            app.config['MESSAGES_MAX_PER_PAGE'])
+        palindrome = parse_palindrome(request.args.get('palindrome'))
+        fields = parse_fields(request.args.get('fields'))
+
+    msgs, has_next = repository.find_after(last_id, limit, palindrome, fields)
+
+    etag = make_etag(represented(msgs, fields), has_next, limit)
+    resp = not_modified(etag)
+    if resp:
+        return resp
+
+    serializer = get_serializer(fields)
+
+    resp = {}
+    if has_next:
+        next_cursor = encode_cursor(msgs[-1].id)
+        filters = _filters(palindrome, fields)
+        resp.update({
+            'next_cursor': next_cursor,
+            'next_url': url_for('api.get_messages', cursor=next_cursor,
+                                limit=limit, **filters)
+        })
+
+    with phase('serialize'):
+        messages = encode_list(serializer.dumps(msg) for msg in msgs)
+    return set_validators(json_response(HTTPStatus.OK, {'messages': messages}, **resp), etag)
+
+
+def _search_messages():
+    """Ranked full-text search, paginated with an offset cursor."""
+    with phase('parse'):
+        terms = parse_search(request.args['q'])
+        cursor = request.args.get('cursor')
+        offset = decode_offset_cursor(cursor) if cursor else 0
+        limit = parse_limit(request.args.get('limit'), app.config['MESSAGES_PER_PAGE'],
+                            app.config['MESSAGES_MAX_PER_PAGE'])
+        palindrome = parse_palindrome(request.args.get('palindrome'))
+        fields = parse_fields(request.args.get('fields'))
+
+    msgs, has_next = repository.search_messages(terms, offset, limit, palindrome, fields)
+
+    etag = make_etag(represented(msgs, fields), has_next, offset, limit)
+    resp = not_modified(etag)
+    if resp:
+        return resp
+
+    serializer = get_serializer(fields)
+
+    resp = {}
+    if has_next:
+        next_cursor = encode_offset_cursor(offset + limit)
+        filters = _filters(palindrome, fields)
+        resp.update({
+            'next_cursor': next_cursor,
+            'next_url': url_for('api.get_messages', q=request.args['q'], cursor=next_cursor,
+                                limit=limit, **filters)
+        })
+
+    with phase('serialize'):
+        messages = encode_list(serializer.dumps(msg) for msg in msgs)
+    return set_validators(json_response(HTTPStatus.OK, {'messages': messages}, **resp), etag)
+
+
+@api.route('/messages/lookup', methods=['POST'])
+def lookup_messages():
+    """
+    ---
+    post:
+      description: Requests many Messages by id in a single call
+      parameters:
+      - name: fields
+        in: query
+        required: false
+        description: Comma separated list of the message fields to return, all of them by default
+      requestBody:
+        required: true
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                ids:
+                  type: array
+                  items:
+                    type: integer
+      responses:
+        200:
+          description: Returns the messages found, in request order, and the missing ids
+          content:
+            application/json:
+              example: {
+                messages: [
+                  {
+                    id: 0,
+                    content: string,
+                    palindrome: false
+                  }
+                ],
+                missing: [1]
+              }
+      tags:
+        - messages
+    """
+    if not request.data:
+        raise WebserviceException(
+            message='Request body cannot be empty.', 
+            code=HTTPStatus.BAD_REQUEST
+        )
+
+    with phase('parse'):
+        data = request.get_json()
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not is_id_list(ids):
+        return jsonify(errors={'ids': ['Must be a list of message ids.']}), \
+            HTTPStatus.BAD_REQUEST
+
+    return _lookup(ids)
+
+
+@api.route('/messages/export', methods=['GET'])
+def export_messages():
+    """
+    ---
+    get:
+      description: Streams all the Messages as newline delimited JSON, in id order
+      parameters:
+      - name: since_id
+        in: query
+        required: false
+        description: Only exports messages with a greater id
+      - name: since_modified
+        in: query
+        required: false
+        description: Only exports messages modified at or after this ISO 8601 datetime
+      - name: fields
+        in: query
+        required: false
+        description: Comma separated list of the message fields to return, all of them by default
+      responses:
+        200:
+          description: Returns one message per line
+          content:
+            application/x-ndjson:
+              schema:
+                $ref: '#/components/schemas/MessageResponseSchema'
+      tags:
+        - messages
+    """
+    since_id = request.args.get('since_id')
+    since_modified = request.args.get('since_modified')
+    try:
+        since_id = int(since_id) if since_id is not None else None
+        since_modified = datetime.fromisoformat(since_modified) \
+            if since_modified is not None else None
+    except ValueError:
+        raise WebserviceException(
+            message='since_id must be an integer and since_modified an ISO 8601 datetime.',
+            code=HTTPStatus.BAD_REQUEST
+        )
+    if since_modified is not None and since_modified.tzinfo is not None:
+        since_modified = since_modified.astimezone(timezone.utc).replace(tzinfo=None)
+    fields = parse_fields(request.args.get('fields'))
+
+    msgs = repository.stream(since_id, since_modified, fields)
+
+    def generate():
+        serializer = get_serializer(fields)
+        for msg in msgs:
+            yield serializer.dumps(msg) + '\n'
+
+    return app.response_class(
+        stream_with_context(generate()),
+        status=HTTPStatus.OK,
+        mimetype='application/x-ndjson'
+    )
+
+
+@api.route('/messages/import', methods=['POST'])
+def import_messages_upload():
+    """
+    ---
+    post:
+      description: Imports Messages from a newline delimited JSON or CSV upload
+      requestBody:
+        required: true
+        content:
+          application/x-ndjson:
+            schema:
+              $ref: '#/components/schemas/MessageRequestSchema'
+          text/csv:
+            schema:
+              type: string
+              description: CSV with a content column
+      responses:
+        200:
+          description: Returns the number of imported and rejected rows
+          content:
+            application/json:
+              example: {
+                imported: 2,
+                rejected: 1,
+                errors: [{line: 2, errors: {content: [Cannot be blank.]}}]
+              }
+      tags:
+        - messages
+    """
+    fmt = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+    try:
+        result = import_messages(request.stream, fmt)
+    except UnicodeDecodeError:
+        raise WebserviceException(
+            message='Upload must be UTF-8 encoded.',
+            code=HTTPStatus.BAD_REQUEST
+        )
+    app.logger.debug('Messages imported: {} imported, {} rejected.'
+                     .format(result['imported'], result['rejected']))
+
+    return jsonify(result), HTTPStatus.OK
 
 
 @api.route('/messages/<int:id>', methods=['PUT'])
@@ -200,28 +710,30 @@ def update_message(id):
       tags:
         - messages
     """
-    msg = Message.find_by_id(id)
-    if not msg:
-        return jsonify(error='Message Not found'), HTTPStatus.BAD_REQUEST
-
     if not request.data:
         raise WebserviceException(
             message='Request body cannot be empty.', 
             code=HTTPStatus.BAD_REQUEST
         )
 
-    data = request.get_json()
-    schema = MessageRequestSchema()
-    err = schema.validate(data)
+    with phase('parse'):
+        data = request.get_json()
+    with phase('validate'):
+        err = MessageRequestSchema().validate(data)
     if err:
         return jsonify(errors=err), HTTPStatus.BAD_REQUEST
     
-    msg.content = data['content']
-    msg.add_or_update()
-    schema = MessageResponseSchema()
+    if coalescer.enabled:
+        msg = coalescer.update(id, data['content'])
+    else:
+        msg = Message.update_by_id(id, data['content'])
+    if not msg:
+        return jsonify(error='Message Not found'), HTTPStatus.BAD_REQUEST
     app.logger.debug('Message with id={} updated.'.format(msg.id))
 
-    return jsonify(message=schema.dump(msg)), HTTPStatus.OK
+    with phase('serialize'):
+        result = get_serializer().dumps(msg)
+    return json_response(HTTPStatus.OK, {'message': result})
 
 
 @api.route('/messages/<int:id>', methods=['DELETE'])
@@ -240,11 +752,8 @@ def delete_message(id):
       tags:
         - messages
     """
-    msg = Message.find_by_id(id)
-    if not msg:
+    if not Message.delete_by_id(id):
         return jsonify(error='Message Not found'), HTTPStatus.BAD_REQUEST
-    
-    msg.delete()
-    app.logger.debug('Message with id={} deleted.'.format(msg.id))
+    app.logger.debug('Message with id={} deleted.'.format(id))
 
     return jsonify(''), HTTPStatus.NO_CONTENT
@@ -0,0 +1,56 @@
+import hashlib
+import threading
+from flask import json as flask_json
+
+
+_lock = threading.Lock()
+
+
+def build_spec(app):
+    """Builds the OpenAPI document from the YAML docstrings of the views."""
+    from apispec import APISpec
+    from apispec.ext.marshmallow import MarshmallowPlugin
+    from apispec_webframeworks.flask import FlaskPlugin
+    from ..models import MessageRequestSchema, MessageResponseSchema, MessageBatchUpdateSchema
+
+    spec = APISpec(
+        title="Messages Webservice",
+        version="1.0.0",
+        openapi_version="3.0.2",
+        plugins=[FlaskPlugin(), MarshmallowPlugin()],
+    )
+    spec.components.schema("MessageRequestSchema", schema=MessageRequestSchema)
+    spec.components.schema("MessageResponseSchema", schema=MessageResponseSchema)
+    spec.components.schema("MessageBatchUpdateSchema", schema=MessageBatchUpdateSchema)
+
+    with app.test_request_context():
+        for fn in app.view_functions:
+            spec.path(view=app.view_functions[fn])
+
+    return spec.to_dict()
+
+
+def encode_spec(app):
+    return (flask_json.dumps(build_spec(app)) + '\n').encode()
+
+
+def spec_document(app):
+    """Returns the encoded OpenAPI document and its ETag.
+
+    The document is read from API_SPEC_FILE when it is set (see the
+    `flask openapi` command), otherwise it is built on first use. Either way
+    it is encoded once per process.
+    """
+    document = app.extensions.get('openapi')
+    if document is None:
+        with _lock:
+            document = app.extensions.get('openapi')
+            if document is None:
+                if app.config.get('API_SPEC_FILE'):
+                    with open(app.config['API_SPEC_FILE'], 'rb') as f:
+                        body = f.read()
+                else:
+                    body = encode_spec(app)
+                document = (body, hashlib.sha1(body).hexdigest())
+                app.extensions['openapi'] = document
+    return document
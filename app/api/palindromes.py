@@ -0,0 +1,86 @@
+from http import HTTPStatus
+from flask import request
+from flask import current_app as app
+
+from . import api
+from ..exceptions import WebserviceException
+from ..palindromes import MODES, classify
+from ..profiler import phase
+from ..serializers import json_response
+
+
+@api.route('/palindromes:check', methods=['POST'])
+def check_palindromes():
+    """
+    ---
+    post:
+      description: Tells which of the given strings are palindromes, nothing is stored
+      requestBody:
+        required: true
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                texts:
+                  type: array
+                  items:
+                    type: string
+                mode:
+                  type: string
+                  enum: [strict, alnum, casefold]
+                  description: >
+                    strict (default) only accepts alphanumeric strings like the messages,
+                    alnum ignores the other characters,
+                    casefold also ignores the case and the Unicode normalization form
+      responses:
+        200:
+          description: Returns one result per string, in request order
+          content:
+            application/json:
+              example: {
+                mode: alnum,
+                results: [true, false]
+              }
+      tags:
+        - palindromes
+    """
+    if not request.data:
+        raise WebserviceException(
+            message='Request body cannot be empty.',
+            code=HTTPStatus.BAD_REQUEST
+        )
+
+    with phase('parse'):
+        data = request.get_json()
+    if not isinstance(data, dict):
+        raise WebserviceException(
+            message='Request body must be an object.',
+            code=HTTPStatus.BAD_REQUEST
+        )
+
+    texts = data.get('texts')
+    mode = data.get('mode', 'strict')
+    with phase('validate'):
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            raise WebserviceException(
+                message='Texts must be a list of strings.',
+                code=HTTPStatus.BAD_REQUEST
+            )
+        if mode not in MODES:
+            raise WebserviceException(
+                message='Mode must be one of {}.'.format(', '.join(MODES)),
+                code=HTTPStatus.BAD_REQUEST
+            )
+        if len(texts) > app.config['PALINDROMES_MAX_BATCH_SIZE']:
+            raise WebserviceException(
+                message='Cannot check more than {} texts.'
+                    .format(app.config['PALINDROMES_MAX_BATCH_SIZE']),
+                code=HTTPStatus.BAD_REQUEST
+            )
+
+    results = classify(texts, mode,
+                       workers=app.config['PALINDROMES_POOL_WORKERS'],
+                       threshold=app.config['PALINDROMES_POOL_THRESHOLD'])
+
+    return json_response(HTTPStatus.OK, mode=mode, results=results)
@@ -0,0 +1,106 @@
+import json
+import base64
+import binascii
+from http import HTTPStatus
+
+from .. import search
+from ..exceptions import WebserviceException
+from ..models import MessageResponseSchema
+
+
+def encode_cursor(last_id, key='id'):
+    raw = json.dumps({key: last_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, key='id'):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        last_id = json.loads(raw)[key]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        last_id = None
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise WebserviceException(
+            message='Invalid cursor.',
+            code=HTTPStatus.BAD_REQUEST
+        )
+    return last_id
+
+
+# search results are ranked, not ordered by id, so their cursor is an offset
+def encode_offset_cursor(offset):
+    return encode_cursor(offset, key='offset')
+
+
+def decode_offset_cursor(cursor):
+    offset = decode_cursor(cursor, key='offset')
+    if offset < 0:
+        raise WebserviceException(
+            message='Invalid cursor.',
+            code=HTTPStatus.BAD_REQUEST
+        )
+    return offset
+
+
+def parse_limit(value, default, maximum):
+    try:
+        limit = int(value) if value is not None else default
+    except ValueError:
+        limit = default
+    if limit < 1:
+        raise WebserviceException(
+            message='Limit must be a positive integer.',
+            code=HTTPStatus.BAD_REQUEST
+        )
+    return min(limit, maximum)
+
+
+def parse_search(value):
+    terms = search.parse_terms(value)
+    if not terms:
+        raise WebserviceException(
+            message='Search query must contain at least one word.',
+            code=HTTPStatus.BAD_REQUEST
+        )
+    return terms
+
+
+def parse_fields(value):
+    """The response fields listed in ?fields=, in schema order, None for all
+    of them."""
+    if value is None:
+        return None
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    fields = MessageResponseSchema.Meta.fields
+    if not names or not names.issubset(fields):
+        raise WebserviceException(
+            message='Fields must be a comma separated list of {}.'.format(', '.join(fields)),
+            code=HTTPStatus.BAD_REQUEST
+        )
+    return tuple(field for field in fields if field in names)
+
+
+def parse_palindrome(value):
+    if value is None:
+        return None
+    if value.lower() not in ('true', 'false'):
+        raise WebserviceException(
+            message='Palindrome must be either true or false.',
+            code=HTTPStatus.BAD_REQUEST
+        )
+    return value.lower() == 'true'
+
+
+def parse_ids(value):
+    try:
+        return [int(id) for id in value.split(',') if id.strip()]
+    except ValueError:
+        raise WebserviceException(
+            message='Ids must be a comma separated list of integers.',
+            code=HTTPStatus.BAD_REQUEST
+        )
+
+
+def is_id_list(ids):
+    return isinstance(ids, list) and \
+        all(isinstance(id, int) and not isinstance(id, bool) for id in ids)
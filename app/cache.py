@@ -0,0 +1,210 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class LocalBackend:
+    """In-process cache bounded by size (least recently used entries are
+    evicted first) and by age (entries expire after `ttl` seconds)."""
+
+    def __init__(self, max_size=10000, ttl=60, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # bumped on every delete, the process is the only writer so one
+        # counter for all the keys is enough
+        self._generation = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def lookup(self, key):
+        """The value of `key` (None if missing) and the version to set the
+        value loaded on a miss with."""
+        version = self._generation
+        return self.get(key), version
+
+    def set(self, key, value, version=None):
+        with self._lock:
+            if version is not None and version != self._generation:
+                return
+            self._entries[key] = (value, self.clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class KeyValueBackend:
+    """Stores the entries, as JSON, in an external key-value store shared by
+    all the worker processes. `client` is anything with redis' get(key),
+    set(key, value, ex=ttl) and pipeline() of get, incr, expire and delete,
+    eviction is left to the store.
+
+    Each key has a version in the store, incremented by delete, and its
+    entry records the version it was loaded at: an entry loaded by one
+    process while another one deleted the key carries the previous version
+    and is never served. Every operation is a single round trip.
+    """
+
+    # kept well past the ttl of the entries and the duration of any load
+    VERSION_TTL = 24 * 3600
+
+    def __init__(self, client, ttl=60, prefix='messages:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, key):
+        return self.prefix + str(key)
+
+    def _version_key(self, key):
+        return '{}version:{}'.format(self.prefix, key)
+
+    def lookup(self, key):
+        """The value of `key` (None if missing or stale) and the version to
+        set the value loaded on a miss with."""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(self._version_key(key))
+        pipe.get(self._key(key))
+        version, entry = pipe.execute()
+        version = int(version) if version is not None else 0
+        if entry is None:
+            return None, version
+        entry_version, value = json.loads(entry)
+        return (value if entry_version == version else None), version
+
+    def get(self, key):
+        return self.lookup(key)[0]
+
+    def set(self, key, value, version=None):
+        if version is None:
+            version = self.lookup(key)[1]
+        self.client.set(self._key(key), json.dumps([version, value]), ex=self.ttl)
+
+    def delete(self, key):
+        pipe = self.client.pipeline()
+        pipe.incr(self._version_key(key))
+        pipe.expire(self._version_key(key), max(self.VERSION_TTL, self.ttl))
+        pipe.delete(self._key(key))
+        pipe.execute()
+
+    def __len__(self):
+        return 0
+
+
+def redis_backend(url, ttl):
+    import redis
+    return KeyValueBackend(redis.Redis.from_url(url), ttl)
+
+
+class _CacheState:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+
+class MessageCache:
+    """Read-through cache of serialized messages by id.
+
+    MESSAGE_CACHE_BACKEND selects the backend: 'local' (default), 'redis'
+    (MESSAGE_CACHE_URL, requires the redis package), None to disable the
+    cache, or a backend instance. 'local' is disabled when SERVER_WORKERS
+    processes serve the app: an update would only invalidate the cache of
+    the one that handled it.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MESSAGE_CACHE_BACKEND', 'local')
+        app.config.setdefault('MESSAGE_CACHE_SIZE', 10000)
+        app.config.setdefault('MESSAGE_CACHE_TTL', 60)
+        app.config.setdefault('MESSAGE_CACHE_URL', None)
+        app.config.setdefault('SERVER_WORKERS', None)
+
+        backend = app.config['MESSAGE_CACHE_BACKEND']
+        ttl = app.config['MESSAGE_CACHE_TTL']
+        workers = app.config['SERVER_WORKERS'] or 1
+        if backend == 'local' and workers > 1:
+            app.logger.warning('The local message cache is disabled with %d workers, '
+                               'set MESSAGE_CACHE_BACKEND=redis to share one', workers)
+            backend = None
+        if backend == 'local':
+            backend = LocalBackend(app.config['MESSAGE_CACHE_SIZE'], ttl)
+        elif backend == 'redis':
+            backend = redis_backend(app.config['MESSAGE_CACHE_URL'], ttl)
+        elif backend in (None, 'none'):
+            backend = None
+
+        app.extensions['message_cache'] = _CacheState(backend)
+
+    @property
+    def _state(self):
+        return current_app.extensions['message_cache']
+
+    @property
+    def enabled(self):
+        return self._state.backend is not None
+
+    def get_or_load(self, id, loader):
+        """Returns the cached value of `id`, or calls `loader` and caches
+        its result unless it is None."""
+        state = self._state
+        if state.backend is None:
+            return loader()
+
+        # a value loaded while the key was invalidated, by this process or
+        # another one, may already be stale: the backend only serves it at
+        # the version read before loading
+        value, version = state.backend.lookup(id)
+        if value is not None:
+            with state.lock:
+                state.hits += 1
+            return value
+
+        with state.lock:
+            state.misses += 1
+        value = loader()
+        if value is not None:
+            state.backend.set(id, value, version)
+        return value
+
+    def invalidate(self, *ids):
+        state = self._state
+        if state.backend is not None:
+            for id in ids:
+                state.backend.delete(id)
+
+    def stats(self):
+        state = self._state
+        return {
+            'hits': state.hits,
+            'misses': state.misses,
+            'size': len(state.backend) if state.backend is not None else 0,
+        }
@@ -0,0 +1,176 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import current_app as app
+
+
+class _Write:
+    """A create (id is None) or an update waiting for its flush."""
+
+    __slots__ = ('id', 'content', 'future', 'queued')
+
+    def __init__(self, id, content):
+        self.id = id
+        self.content = content
+        self.future = Future()
+        self.queued = time.perf_counter()
+
+
+class _CoalescerState:
+
+    def __init__(self, app):
+        self.app = app
+        self.queue = queue.Queue()
+        self.thread = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+
+class WriteCoalescer:
+    """Group commit of the message creates and updates.
+
+    With WRITE_COALESCING the writes of concurrent requests are queued to a
+    flusher thread of the process, which applies up to
+    WRITE_COALESCING_MAX_BATCH of them, arrived within
+    WRITE_COALESCING_MAX_WAIT_MS of the first one, in a single transaction:
+    one commit instead of one per request. The requests block until their
+    batch is committed and get their own row back. If the batch fails, its
+    writes are retried one transaction each, so only the failing ones fail.
+
+    It needs a process that handles several requests at once: with
+    SERVER_THREADS 1 (gunicorn sync workers) no other write can arrive
+    while one is waiting, so the flusher does not wait for them.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('WRITE_COALESCING', False)
+        app.config.setdefault('WRITE_COALESCING_MAX_BATCH', 64)
+        app.config.setdefault('WRITE_COALESCING_MAX_WAIT_MS', 2)
+        app.config.setdefault('SERVER_THREADS', None)
+        if app.config['WRITE_COALESCING'] and app.config['SERVER_THREADS'] == 1:
+            app.logger.warning('WRITE_COALESCING has no concurrent writes to batch with '
+                               'single threaded workers, use gthread workers')
+        app.extensions['write_coalescer'] = _CoalescerState(app)
+
+    @property
+    def enabled(self):
+        return app.config['WRITE_COALESCING']
+
+    def create(self, content):
+        """Creates a message, returns its row."""
+        return self._submit(_Write(None, content))
+
+    def update(self, id, content):
+        """Updates a message, returns its row or None if it does not exist."""
+        return self._submit(_Write(id, content))
+
+    def _submit(self, write):
+        state = app.extensions['write_coalescer']
+        self._start(state)
+        state.queue.put(write)
+        return write.future.result()
+
+    def _start(self, state):
+        # started on first use, so that a preloaded app starts one per worker
+        with state.lock:
+            if state.thread is None or state.pid != os.getpid():
+                state.queue = queue.Queue()
+                state.thread = threading.Thread(
+                    target=self._run, args=(state,), name='write-coalescer', daemon=True)
+                state.pid = os.getpid()
+                state.thread.start()
+
+    def _run(self, state):
+        max_batch = state.app.config['WRITE_COALESCING_MAX_BATCH']
+        max_wait = state.app.config['WRITE_COALESCING_MAX_WAIT_MS'] / 1000
+        if state.app.config['SERVER_THREADS'] == 1:
+            # the write being flushed blocks the only request of the process
+            max_wait = 0
+        while True:
+            batch = [state.queue.get()]
+            deadline = batch[0].queued + max_wait
+            while len(batch) < max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(state.queue.get(timeout=remaining) if remaining > 0
+                                 else state.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with state.app.app_context():
+                    self._flush(batch)
+            except Exception as e:
+                state.app.logger.exception('Failed to flush coalesced writes')
+                for write in batch:
+                    if not write.future.done():
+                        write.future.set_exception(e)
+
+    def _flush(self, batch):
+        from . import db
+
+        started = time.perf_counter()
+        engine = db.get_engine()
+        try:
+            with engine.begin() as conn:
+                results = self._apply(conn, batch)
+        except Exception:
+            app.logger.warning('Coalesced batch of %d writes failed, retrying them one by one',
+                               len(batch), exc_info=True)
+            results = []
+            for write in batch:
+                try:
+                    with engine.begin() as conn:
+                        results.extend(self._apply(conn, [write]))
+                except Exception as e:
+                    write.future.set_exception(e)
+
+        self._written(results)
+        self._observe(batch, started)
+        for write, row in results:
+            write.future.set_result(row)
+
+    @staticmethod
+    def _apply(conn, batch):
+        """Runs the writes of `batch` on `conn`, returns them with their row,
+        read back in the same transaction, or None for the missing ids."""
+        from .models import Message, content_values
+        from .repository import _select
+
+        message = Message.__table__
+        ids = []
+        for write in batch:
+            values = content_values(write.content)
+            if write.id is None:
+                result = conn.execute(message.insert().values(**values))
+                ids.append(result.inserted_primary_key[0])
+            else:
+                result = conn.execute(
+                    message.update().where(message.c.id == write.id).values(**values))
+                ids.append(write.id if result.rowcount else None)
+
+        found = [id for id in ids if id is not None]
+        rows = {row.id: row for row in conn.execute(_select().where(message.c.id.in_(found)))} \
+            if found else {}
+        return [(write, rows.get(id)) for write, id in zip(batch, ids)]
+
+    @staticmethod
+    def _written(results):
+        from . import cache, enricher
+
+        written = [(row.id, row.content) for _, row in results if row is not None]
+        cache.invalidate(*(write.id for write, row in results
+                           if write.id is not None and row is not None))
+        enricher.submit(*written)
+
+    @staticmethod
+    def _observe(batch, started):
+        if not app.config.get('METRICS_ENABLED'):
+            return
+        from .metrics import COALESCED_BATCH_SIZE, COALESCED_WAIT
+
+        COALESCED_BATCH_SIZE.observe(len(batch))
+        for write in batch:
+            COALESCED_WAIT.observe(started - write.queued)
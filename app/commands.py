@@ -0,0 +1,49 @@
+import os
+import click
+from flask.cli import AppGroup, with_appcontext
+
+from .importer import import_messages, FORMATS
+
+
+messages_cli = AppGroup('messages', help='Manage the messages.')
+
+
+@messages_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS),
+              help='Format of the file, guessed from its extension by default.')
+def import_command(path, fmt):
+    """Imports the messages of an NDJSON or CSV file."""
+    if fmt is None:
+        fmt = 'csv' if os.path.splitext(path)[1].lower() == '.csv' else 'ndjson'
+
+    with open(path, 'rb') as f:
+        result = import_messages(f, fmt)
+
+    for error in result['errors']:
+        click.echo('line {}: {}'.format(error['line'], error['errors']), err=True)
+    click.echo('{} imported, {} rejected'.format(result['imported'], result['rejected']))
+
+
+@messages_cli.command('enrich')
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Number of messages written per transaction.')
+def enrich_command(batch_size):
+    """Computes the longest palindrome of the messages that lack it."""
+    from . import enricher
+
+    count = enricher.backfill(batch_size)
+    click.echo('{} enriched'.format(count))
+
+
+@click.command('openapi')
+@with_appcontext
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+def openapi_command(path):
+    """Writes the OpenAPI document to a file, to be served with API_SPEC_FILE."""
+    from flask import current_app
+    from .api.openapi import encode_spec
+
+    with open(path, 'wb') as f:
+        f.write(encode_spec(current_app))
+    click.echo('OpenAPI document written to {}'.format(path))
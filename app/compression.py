@@ -0,0 +1,204 @@
+import gzip
+import threading
+import zlib
+
+from flask import request
+from flask import current_app as app
+
+from .profiler import phase
+
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+class _GzipCompressor:
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        # no timestamp, the same body always gives the same bytes
+        return gzip.compress(data, self.level, mtime=0)
+
+    def compressobj(self):
+        # wbits 31: gzip header and trailer
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+
+class _BrotliStream:
+
+    def __init__(self, compressor):
+        self._compressor = compressor
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+class _BrotliCompressor:
+    def __init__(self, level):
+        import brotli
+        self._brotli = brotli
+        self.level = level
+
+    def compress(self, data):
+        return self._brotli.compress(data, quality=self.level)
+
+    def compressobj(self):
+        return _BrotliStream(self._brotli.Compressor(quality=self.level))
+
+
+class _ZstdCompressor:
+    def __init__(self, level):
+        import zstandard
+        self._compressor = zstandard.ZstdCompressor(level=level)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def compressobj(self):
+        return self._compressor.compressobj()
+
+
+# in order of preference, the ones whose package is missing are left out
+COMPRESSORS = {
+    'br': (_BrotliCompressor, 'COMPRESSION_BR_LEVEL'),
+    'zstd': (_ZstdCompressor, 'COMPRESSION_ZSTD_LEVEL'),
+    'gzip': (_GzipCompressor, 'COMPRESSION_LEVEL'),
+}
+
+
+class _CompressionState:
+
+    def __init__(self, compressors):
+        self.compressors = compressors
+        # precompressed bodies by (key, encoding)
+        self.static = {}
+        self.lock = threading.Lock()
+
+
+class Compression:
+    """Compresses the responses with the best encoding the client accepts:
+    br and zstd when the brotli and zstandard packages are installed, gzip
+    otherwise.
+
+    Only JSON, NDJSON and text bodies of at least COMPRESSION_MIN_SIZE bytes
+    are compressed, streamed ones chunk by chunk. A compressed response gets
+    an ETag suffixed with its encoding, a distinct validator for a distinct
+    body, and bodies that do not change are compressed once with static().
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESSION_ENABLED', True)
+        app.config.setdefault('COMPRESSION_MIN_SIZE', 500)
+        app.config.setdefault('COMPRESSION_LEVEL', 6)
+        app.config.setdefault('COMPRESSION_BR_LEVEL', 4)
+        app.config.setdefault('COMPRESSION_ZSTD_LEVEL', 3)
+        if not app.config['COMPRESSION_ENABLED']:
+            app.extensions['compression'] = _CompressionState({})
+            return
+
+        compressors = {}
+        for encoding, (compressor, level) in COMPRESSORS.items():
+            try:
+                compressors[encoding] = compressor(app.config[level])
+            except ImportError:
+                continue
+        app.extensions['compression'] = _CompressionState(compressors)
+        app.after_request(self._after_request)
+
+    @property
+    def _state(self):
+        return app.extensions['compression']
+
+    def negotiate(self):
+        """The encoding to compress the response with, None for identity."""
+        accepted = request.accept_encodings
+        best, best_quality = None, 0
+        for encoding in self._state.compressors:
+            quality = accepted[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def static(self, response, key):
+        """Compresses the body of `response`, a bytes body that is always the
+        same for `key`, reusing its compressed form across requests."""
+        encoding = self.negotiate()
+        if encoding is None or \
+                response.calculate_content_length() < app.config['COMPRESSION_MIN_SIZE']:
+            return self._vary(response)
+
+        state = self._state
+        body = state.static.get((key, encoding))
+        if body is None:
+            with state.lock:
+                body = state.static.get((key, encoding))
+                if body is None:
+                    body = state.compressors[encoding].compress(response.get_data())
+                    state.static[(key, encoding)] = body
+        response.set_data(body)
+        return self._encoded(response, encoding)
+
+    def _after_request(self, response):
+        if response.status_code == 304:
+            return self._not_modified(response)
+        if 'Content-Encoding' in response.headers or response.direct_passthrough or \
+                response.status_code < 200 or response.status_code == 204 or \
+                not response.mimetype.startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        self._vary(response)
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+        compressor = self._state.compressors[encoding]
+
+        if response.is_streamed:
+            response.response = self._stream(compressor, response.response)
+            response.headers.pop('Content-Length', None)
+        else:
+            if response.calculate_content_length() < app.config['COMPRESSION_MIN_SIZE']:
+                return response
+            with phase('compress'):
+                response.set_data(compressor.compress(response.get_data()))
+        return self._encoded(response, encoding)
+
+    @staticmethod
+    def _stream(compressor, chunks):
+        stream = compressor.compressobj()
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                data = stream.compress(chunk)
+                if data:
+                    yield data
+            yield stream.flush()
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    @staticmethod
+    def _vary(response):
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def _encoded(self, response, encoding):
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag('{}-{}'.format(etag, encoding), weak)
+        return self._vary(response)
+
+    def _not_modified(self, response):
+        # the client holds the variant of the encoding it revalidates
+        etag, weak = response.get_etag()
+        if etag and request.if_none_match:
+            for encoding in self._state.compressors:
+                variant = '{}-{}'.format(etag, encoding)
+                if request.if_none_match.contains_weak(variant):
+                    response.set_etag(variant, weak)
+                    break
+        return self._vary(response)
@@ -4,19 +4,95 @@ import logging
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+def _mysql_uris(user, password, hosts, default_port, name):
+    uris = []
+    for host in (hosts or '').split(','):
+        host = host.strip()
+        if host:
+            if ':' not in host:
+                host = '{}:{}'.format(host, default_port)
+            uris.append('mysql+pymysql://{}:{}@{}/{}'.format(user, password, host, name))
+    return uris
+
+
 class Config:
     NAME = 'webservice'
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'hard to guess string'
     MESSAGES_PER_PAGE = 10
+    MESSAGES_MAX_PER_PAGE = 100
+    MESSAGES_MAX_BATCH_SIZE = 1000
+    MESSAGES_EXPORT_BATCH_SIZE = 1000
+    MESSAGES_IMPORT_CHUNK_SIZE = 1000
+    MESSAGES_IMPORT_MAX_ERRORS = 100
+    # POST /palindromes:check, batches of at least PALINDROMES_POOL_THRESHOLD
+    # characters are spread over a pool of processes (0 or 1 disables it)
+    PALINDROMES_MAX_BATCH_SIZE = 100000
+    PALINDROMES_POOL_WORKERS = int(os.environ.get('PALINDROMES_POOL_WORKERS') or
+                                   min(os.cpu_count() or 1, 4))
+    PALINDROMES_POOL_THRESHOLD = 1000000
+    # longest palindromic substring of the messages: 'thread' (background
+    # worker), 'inline' or 'off' (`flask messages enrich` only)
+    ENRICHMENT_MODE = os.environ.get('ENRICHMENT_MODE') or 'thread'
+    ENRICHMENT_BATCH_SIZE = 100
+    # seconds a process waits on exit for its queue to be written
+    ENRICHMENT_DRAIN_TIMEOUT = float(os.environ.get('ENRICHMENT_DRAIN_TIMEOUT') or 10)
+    # group commit of the creates and updates of concurrent requests: up to
+    # WRITE_COALESCING_MAX_BATCH writes arrived within
+    # WRITE_COALESCING_MAX_WAIT_MS of the first one share a transaction.
+    # Needs threaded workers (gthread), a process that handles one request
+    # at a time (SERVER_THREADS=1, set by gunicorn.conf.py) does not wait
+    WRITE_COALESCING = (os.environ.get('WRITE_COALESCING') or 'false').lower() == 'true'
+    WRITE_COALESCING_MAX_BATCH = int(os.environ.get('WRITE_COALESCING_MAX_BATCH') or 64)
+    WRITE_COALESCING_MAX_WAIT_MS = float(os.environ.get('WRITE_COALESCING_MAX_WAIT_MS') or 2)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_RECORD_QUERIES = False
+    # Prometheus metrics on /metrics
+    METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or 'true').lower() == 'true'
+    # compression of the JSON, NDJSON and text responses of at least
+    # COMPRESSION_MIN_SIZE bytes, br and zstd need the brotli and zstandard
+    # packages
+    COMPRESSION_ENABLED = (os.environ.get('COMPRESSION_ENABLED') or 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE') or 500)
+    COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL') or 6)
+    COMPRESSION_BR_LEVEL = int(os.environ.get('COMPRESSION_BR_LEVEL') or 4)
+    COMPRESSION_ZSTD_LEVEL = int(os.environ.get('COMPRESSION_ZSTD_LEVEL') or 3)
+    # Server-Timing header and slow request/query log
+    REQUEST_PROFILING = (os.environ.get('REQUEST_PROFILING') or 'false').lower() == 'true'
+    PROFILER_SLOW_REQUEST_MS = int(os.environ.get('PROFILER_SLOW_REQUEST_MS') or 500)
+    PROFILER_SLOW_QUERY_MS = int(os.environ.get('PROFILER_SLOW_QUERY_MS') or 100)
+    # Cache of serialized messages: 'local', 'redis' or 'none'. 'local' is
+    # per process and only invalidated in the one that wrote, it is turned
+    # off when SERVER_WORKERS (set by gunicorn.conf.py) is more than one
+    MESSAGE_CACHE_BACKEND = os.environ.get('MESSAGE_CACHE_BACKEND') or 'local'
+    MESSAGE_CACHE_URL = os.environ.get('MESSAGE_CACHE_URL')
+    MESSAGE_CACHE_SIZE = 10000
+    MESSAGE_CACHE_TTL = 60
+    # processes serving the app and requests each of them handles at once,
+    # None when unknown
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS') or 0) or None
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS') or 0) or None
+    # 'fast' (precompiled encoder) or 'marshmallow'
+    MESSAGE_SERIALIZER = os.environ.get('MESSAGE_SERIALIZER') or 'fast'
+    # Swagger UI and /swagger.json, API_SPEC_FILE serves a document written
+    # by `flask openapi` instead of building it at runtime
+    API_DOCS = (os.environ.get('API_DOCS') or 'true').lower() == 'true'
+    API_DOCS_MAX_AGE = 3600
+    API_SPEC_FILE = os.environ.get('API_SPEC_FILE')
+    # logs the time spent in each step of create_app
+    STARTUP_PROFILE = (os.environ.get('STARTUP_PROFILE') or 'false').lower() == 'true'
+    # Flask-Migrate (alembic) for the `flask db` commands, None loads it only
+    # when the app is created by the flask cli
+    DB_MIGRATIONS = None
 
     @staticmethod
     def init_app(app):
         import sys
+        from flask.logging import default_handler
+        app.logger.removeHandler(default_handler)
         handler = logging.StreamHandler(sys.stdout)
         handler.setLevel(app.config['LOG_LEVEL'])
         app.logger.addHandler(handler)
+        app.logger.setLevel(app.config['LOG_LEVEL'])
 
 
 class DevelopmentConfig(Config):
@@ -24,7 +100,8 @@ class DevelopmentConfig(Config):
     LOG_LEVEL = os.environ.get('LOG_LEVEL') or logging.INFO
     LOGGER_NAME = ENV_NAME + '-' + Config.NAME
     # Database settings
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'app.db')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DEV_DATABASE_URI') or \
+        'sqlite:///' + os.path.join(basedir, 'app.db')
 
 
 class ProductionConfig(Config):
@@ -41,6 +118,12 @@ class ProductionConfig(Config):
     # mysql+pymysql://<username>:<password>@<host>/<dbname>[?<options>]
     SQLALCHEMY_DATABASE_URI = 'mysql+pymysql://{}:{}@{}:{}/{}'\
         .format(DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME) 
+    # comma separated <host>[:<port>] of the read replicas, reads of GET
+    # requests are spread over them
+    DB_REPLICA_HOSTS = os.environ.get('DB_REPLICA_HOSTS')
+    SQLALCHEMY_REPLICA_URIS = _mysql_uris(
+        DB_USER, DB_PASSWORD, DB_REPLICA_HOSTS, DB_PORT, DB_NAME)
+    READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS') or 5)
         
 
 class TestConfig(Config):
@@ -49,6 +132,7 @@ class TestConfig(Config):
     LOGGER_NAME = ENV_NAME + '-' + Config.NAME
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    ENRICHMENT_MODE = 'inline'
 
 
 config = {
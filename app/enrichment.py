@@ -0,0 +1,167 @@
+import atexit
+import os
+import queue
+import threading
+import time
+
+from flask import current_app as app
+from sqlalchemy import bindparam, select
+
+
+def enrichment_update():
+    """UPDATE of the enrichment columns of a message, for executemany with
+    the parameters of enrichment_params(). It only applies if the content
+    is still the one the values were computed from, and it moves
+    date_modified since the representation changes."""
+    from .models import Message
+
+    message = Message.__table__
+    return message.update()\
+        .where(message.c.id == bindparam('_id'))\
+        .where(message.c.content == bindparam('_content'))\
+        .values(
+            longest_palindrome=bindparam('_longest_palindrome'),
+            longest_palindrome_start=bindparam('_start'),
+            longest_palindrome_end=bindparam('_end'),
+        )
+
+
+def enrichment_params(id, content):
+    from .palindromes import longest_palindrome
+
+    start, end = longest_palindrome(content)
+    return {'_id': id, '_content': content, '_longest_palindrome': content[start:end],
+            '_start': start, '_end': end}
+
+
+class _EnricherState:
+
+    def __init__(self, app):
+        self.app = app
+        self.queue = queue.Queue()
+        self.thread = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+
+class Enricher:
+    """Computes the longest palindromic substring of the created and updated
+    messages out of the request path.
+
+    ENRICHMENT_MODE 'thread' queues them for a worker thread of the process
+    that writes them in batches of up to ENRICHMENT_BATCH_SIZE, 'inline'
+    writes them right away (tests) and 'off' leaves them to the
+    `flask messages enrich` backfill. On exit, e.g. a recycled gunicorn
+    worker, the process waits up to ENRICHMENT_DRAIN_TIMEOUT seconds for
+    the queue to be written.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('ENRICHMENT_MODE', 'thread')
+        app.config.setdefault('ENRICHMENT_BATCH_SIZE', 100)
+        app.config.setdefault('ENRICHMENT_DRAIN_TIMEOUT', 10)
+        if app.config['ENRICHMENT_MODE'] not in ('thread', 'inline', 'off'):
+            raise ValueError('Unknown enrichment mode {}.'.format(app.config['ENRICHMENT_MODE']))
+        app.extensions['enricher'] = _EnricherState(app)
+
+    def submit(self, *messages):
+        """Enriches the given (id, content) pairs."""
+        mode = app.config['ENRICHMENT_MODE']
+        if not messages or mode == 'off':
+            return
+        if mode == 'inline':
+            self.write(messages)
+            return
+
+        state = app.extensions['enricher']
+        self._start(state)
+        for message in messages:
+            state.queue.put(message)
+
+    def join(self):
+        """Blocks until the queued messages are written."""
+        app.extensions['enricher'].queue.join()
+
+    def drain(self, timeout):
+        """Waits up to `timeout` seconds for the queued messages to be
+        written, returns whether they all were."""
+        return self._drain(app.extensions['enricher'], timeout)
+
+    def write(self, messages):
+        from . import db, cache
+
+        params = [enrichment_params(id, content) for id, content in messages]
+        with db.get_engine().begin() as conn:
+            conn.execute(enrichment_update(), params)
+        cache.invalidate(*(id for id, _ in messages))
+
+    def backfill(self, batch_size):
+        """Enriches the messages that are not yet, in batches of
+        `batch_size`, returns how many were."""
+        from . import db
+        from .models import Message
+
+        message = Message.__table__
+        query = select(message.c.id, message.c.content)\
+            .where(message.c.longest_palindrome_start.is_(None))\
+            .order_by(message.c.id).limit(batch_size)
+        last_id, count = None, 0
+        while True:
+            batch_query = query if last_id is None else query.where(message.c.id > last_id)
+            with db.get_engine().connect() as conn:
+                rows = conn.execute(batch_query).all()
+            if not rows:
+                return count
+            self.write([(row.id, row.content) for row in rows])
+            last_id = rows[-1].id
+            count += len(rows)
+
+    def _start(self, state):
+        # started on first use, so that a preloaded app starts one per worker
+        with state.lock:
+            if state.thread is None or state.pid != os.getpid():
+                state.queue = queue.Queue()
+                state.thread = threading.Thread(
+                    target=self._run, args=(state,), name='enricher', daemon=True)
+                state.pid = os.getpid()
+                state.thread.start()
+                atexit.register(self._exit, state, os.getpid())
+
+    def _exit(self, state, pid):
+        # inherited by the processes forked after it was registered
+        if pid == os.getpid():
+            self._drain(state, state.app.config['ENRICHMENT_DRAIN_TIMEOUT'])
+
+    @staticmethod
+    def _drain(state, timeout):
+        messages = state.queue
+        deadline = time.monotonic() + timeout
+        with messages.all_tasks_done:
+            while messages.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    state.app.logger.warning(
+                        '%d messages left to enrich, `flask messages enrich` fills them in',
+                        messages.unfinished_tasks)
+                    return False
+                messages.all_tasks_done.wait(remaining)
+        return True
+
+    def _run(self, state):
+        batch_size = state.app.config['ENRICHMENT_BATCH_SIZE']
+        while True:
+            messages = [state.queue.get()]
+            while len(messages) < batch_size:
+                try:
+                    messages.append(state.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with state.app.app_context():
+                    # the latest content of each message is enough
+                    self.write(list(dict(messages).items()))
+            except Exception:
+                state.app.logger.exception('Failed to enrich messages')
+            finally:
+                for _ in messages:
+                    state.queue.task_done()
@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+from itertools import islice
+from flask import current_app as app
+
+from . import db
+from .models import Message, MessageRequestSchema, is_palindrome
+
+
+FORMATS = ('ndjson', 'csv')
+
+
+def _read_ndjson(lines):
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line), None
+        except ValueError:
+            yield line_no, None, {'_schema': ['Invalid JSON.']}
+
+
+def _read_csv(lines):
+    reader = csv.DictReader(lines)
+    if not reader.fieldnames or 'content' not in reader.fieldnames:
+        yield 1, None, {'_schema': ['Missing content column.']}
+        return
+    for row in reader:
+        yield reader.line_num, {'content': row['content']}, None
+
+
+def import_messages(stream, fmt):
+    """Loads messages from the binary `stream` of NDJSON or CSV rows.
+
+    Rows are read incrementally, validated and inserted in chunks of
+    MESSAGES_IMPORT_CHUNK_SIZE with a commit per chunk, so memory stays bounded
+    by the chunk size. Invalid rows are rejected without aborting the load,
+    the first MESSAGES_IMPORT_MAX_ERRORS of them are reported.
+    """
+    chunk_size = app.config['MESSAGES_IMPORT_CHUNK_SIZE']
+    max_errors = app.config['MESSAGES_IMPORT_MAX_ERRORS']
+
+    lines = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    rows = _read_csv(lines) if fmt == 'csv' else _read_ndjson(lines)
+    schema = MessageRequestSchema(many=True)
+    table = Message.__table__
+
+    result = {'imported': 0, 'rejected': 0, 'errors': []}
+
+    def reject(line_no, err):
+        result['rejected'] += 1
+        if len(result['errors']) < max_errors:
+            result['errors'].append({'line': line_no, 'errors': err})
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        parsed = []
+        for line_no, data, err in chunk:
+            if err:
+                reject(line_no, err)
+            else:
+                parsed.append((line_no, data))
+
+        errors = schema.validate([data for _, data in parsed])
+        values = []
+        for i, (line_no, data) in enumerate(parsed):
+            if i in errors:
+                reject(line_no, errors[i])
+            else:
+                values.append({
+                    'content': data['content'],
+                    'palindrome': is_palindrome(data['content'])
+                })
+
+        if values:
+            db.session.execute(table.insert(), values)
+            db.session.commit()
+            result['imported'] += len(values)
+
+    return result
@@ -0,0 +1,160 @@
+import os
+import time
+
+from flask import g, request, has_request_context
+from flask import current_app as app
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, \
+    REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .routing import RoutingSession
+
+
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+REQUESTS = Counter(
+    'http_requests_total', 'Requests by route and status.',
+    ['method', 'route', 'status'])
+LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by route.',
+    ['method', 'route'], buckets=LATENCY_BUCKETS)
+REQUEST_SIZE = Histogram(
+    'http_request_size_bytes', 'Request body size by route.',
+    ['method', 'route'], buckets=SIZE_BUCKETS)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Response body size by route, streamed responses excluded.',
+    ['method', 'route'], buckets=SIZE_BUCKETS)
+DB_QUERIES = Histogram(
+    'db_queries_per_request', 'Number of SQL statements executed per request.',
+    ['method', 'route'], buckets=QUERY_BUCKETS)
+DB_TIME = Histogram(
+    'db_time_per_request_seconds', 'Time spent executing SQL statements per request.',
+    ['method', 'route'], buckets=LATENCY_BUCKETS)
+DB_COMMIT = Histogram(
+    'db_commit_duration_seconds', 'Latency of the session commits, flush included.',
+    buckets=LATENCY_BUCKETS)
+COALESCED_BATCH_SIZE = Histogram(
+    'write_coalescing_batch_size', 'Number of writes committed per coalesced transaction.',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+COALESCED_WAIT = Histogram(
+    'write_coalescing_wait_seconds', 'Time the coalesced writes waited for their flush.',
+    buckets=LATENCY_BUCKETS)
+POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out', 'Connections checked out of the pool.',
+    ['engine'], multiprocess_mode='livesum')
+POOL_OVERFLOW = Gauge(
+    'db_pool_overflow', 'Connections opened above the pool size.',
+    ['engine'], multiprocess_mode='livesum')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    if has_request_context():
+        g._db_queries = g.get('_db_queries', 0) + 1
+        g._db_time = g.get('_db_time', 0) + elapsed
+
+
+def _before_commit(session):
+    session.info['commit_started'] = time.perf_counter()
+
+
+def _after_commit(session):
+    started = session.info.pop('commit_started', None)
+    if started is not None:
+        DB_COMMIT.observe(time.perf_counter() - started)
+
+
+def _after_rollback(session):
+    session.info.pop('commit_started', None)
+
+
+class Metrics:
+    """Prometheus metrics of the requests, the SQL statements they run, the
+    session commits and the connection pools, served on /metrics.
+
+    With several worker processes PROMETHEUS_MULTIPROC_DIR must name an
+    empty directory shared by all of them, set before they start (see
+    gunicorn.conf.py), /metrics then aggregates the values of all of them.
+    """
+
+    _listening = False
+
+    def init_app(self, app, db):
+        app.config.setdefault('METRICS_ENABLED', True)
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        # the statement and commit listeners are global, installed once
+        if not Metrics._listening:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(RoutingSession, 'before_commit', _before_commit)
+            event.listen(RoutingSession, 'after_commit', _after_commit)
+            event.listen(RoutingSession, 'after_rollback', _after_rollback)
+            Metrics._listening = True
+
+        self.watch_pool(db.get_engine(app), 'primary')
+        replicas = app.extensions.get('replicas')
+        for i, engine in enumerate(replicas.engines if replicas else ()):
+            self.watch_pool(engine, 'replica{}'.format(i))
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view, methods=['GET'])
+
+    @staticmethod
+    def watch_pool(engine, name):
+        checked_out = POOL_CHECKED_OUT.labels(name)
+        overflow = POOL_OVERFLOW.labels(name)
+
+        def update_overflow(pool):
+            if hasattr(pool, 'overflow'):
+                overflow.set(max(pool.overflow(), 0))
+
+        @event.listens_for(engine, 'checkout')
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            checked_out.inc()
+            update_overflow(engine.pool)
+
+        @event.listens_for(engine, 'checkin')
+        def on_checkin(dbapi_connection, connection_record):
+            checked_out.dec()
+            update_overflow(engine.pool)
+
+    @staticmethod
+    def _before_request():
+        g._request_started = time.perf_counter()
+
+    @staticmethod
+    def _after_request(response):
+        started = g.get('_request_started')
+        if started is None or request.endpoint == 'metrics':
+            return response
+
+        # label by route template, not by path, to bound the cardinality
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        method = request.method
+        LATENCY.labels(method, route).observe(time.perf_counter() - started)
+        REQUESTS.labels(method, route, response.status_code).inc()
+        REQUEST_SIZE.labels(method, route).observe(request.content_length or 0)
+        if not response.is_streamed:
+            RESPONSE_SIZE.labels(method, route).observe(response.calculate_content_length() or 0)
+        DB_QUERIES.labels(method, route).observe(g.get('_db_queries', 0))
+        DB_TIME.labels(method, route).observe(g.get('_db_time', 0))
+        return response
+
+    @staticmethod
+    def metrics_view():
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return app.response_class(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
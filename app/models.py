@@ -1,6 +1,5 @@
 from marshmallow import fields, validate, ValidationError
-from flask import current_app as app
-from . import ma, db
+from . import ma, db, cache, enricher, search
 
 
 def is_palindrome(o):
@@ -12,6 +11,16 @@ def is_palindrome(o):
     chars = o[::]
     return chars == chars[::-1]
 
+def content_values(content):
+    """Column values of a message set to `content`, its enrichment reset."""
+    return {
+        'content': content,
+        'palindrome': is_palindrome(content),
+        'longest_palindrome': None,
+        'longest_palindrome_start': None,
+        'longest_palindrome_end': None,
+    }
+
 def _validate_notblank(val):
     if val.isspace():
         raise ValidationError(message=['Cannot be blank.'], field_name='content')
@@ -22,6 +31,11 @@ class Message(db.Model):
 
     id            = db.Column(db.Integer, primary_key=True)
     content       = db.Column(db.String(255), nullable=False)   
+    palindrome    = db.Column(db.Boolean, nullable=False, default=False, index=True)
+    # filled in the background by the enricher, null until then
+    longest_palindrome       = db.Column(db.String(255))
+    longest_palindrome_start = db.Column(db.Integer)
+    longest_palindrome_end   = db.Column(db.Integer)
     date_created  = db.Column(db.DateTime,  default=db.func.current_timestamp())
     date_modified = db.Column(
         db.DateTime,  
@@ -33,20 +47,118 @@ class Message(db.Model):
         return "Message(id='{self.id}',content='{self.content}')".format(self=self)
 
     def add_or_update(self):
+        self.palindrome = is_palindrome(self.content)
+        self.reset_enrichment()
         db.session.add(self)
         db.session.commit()
+        cache.invalidate(self.id)
+        enricher.submit((self.id, self.content))
+
+    def reset_enrichment(self):
+        self.longest_palindrome = None
+        self.longest_palindrome_start = None
+        self.longest_palindrome_end = None
 
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        cache.invalidate(self.id)
+
+    @classmethod
+    def update_by_id(cls, id, content):
+        """Updates a message with a single UPDATE, without loading it first.
+
+        Returns its row, from RETURNING where the database supports it,
+        otherwise read back in the same transaction, or None if there is no
+        message `id`.
+        """
+        from .repository import _columns, _select
+
+        message = cls.__table__
+        query = message.update().where(message.c.id == id).values(**content_values(content))
+        returning = getattr(db.session.connection().dialect, 'full_returning', False)
+        if returning:
+            query = query.returning(*_columns())
+
+        result = db.session.execute(query)
+        if returning:
+            row = result.first()
+        elif result.rowcount:
+            # matched rows, SQLAlchemy connects to MySQL with CLIENT_FOUND_ROWS
+            row = db.session.execute(_select().where(message.c.id == id)).first()
+        else:
+            row = None
+        if row is None:
+            db.session.rollback()
+            return None
+        db.session.commit()
+        cache.invalidate(id)
+        enricher.submit((id, content))
+        return row
+
+    @classmethod
+    def delete_by_id(cls, id):
+        """Deletes a message with a single DELETE, returns whether it
+        existed."""
+        message = cls.__table__
+        deleted = db.session.execute(message.delete().where(message.c.id == id)).rowcount
+        db.session.commit()
+        if deleted:
+            cache.invalidate(id)
+        return bool(deleted)
+
+    @classmethod
+    def bulk_write(cls, creates=(), updates=None, deletes=()):
+        """Applies creates (contents), updates (id -> content) and deletes (ids)
+        in a single transaction.
+
+        Returns the created messages, the updated messages by id and the
+        deleted ids. Ids that do not exist are left out of the results.
+        """
+        updates = updates or {}
+        created = [cls(content=content, palindrome=is_palindrome(content))
+                   for content in creates]
+        db.session.add_all(created)
+
+        ids = set(updates) | set(deletes)
+        existing = {msg.id: msg for msg in cls.query.filter(Message.id.in_(ids))} \
+            if ids else {}
+
+        updated = {}
+        for id, content in updates.items():
+            msg = existing.get(id)
+            if msg is not None:
+                msg.content = content
+                msg.palindrome = is_palindrome(content)
+                msg.reset_enrichment()
+                updated[id] = msg
+
+        deleted = [id for id in dict.fromkeys(deletes) if id in existing]
+        if deleted:
+            for id in deleted:
+                db.session.expunge(existing[id])
+            cls.query.filter(Message.id.in_(deleted))\
+                .delete(synchronize_session=False)
+
+        db.session.flush()
+        written = [(msg.id, msg.content) for msg in created] + \
+            [(id, msg.content) for id, msg in updated.items()]
+        db.session.commit()
+        cache.invalidate(*updated, *deleted)
+        enricher.submit(*written)
+
+        # reload the expired rows with a single query instead of one per message
+        if written:
+            cls.query.filter(Message.id.in_([id for id, _ in written])).all()
+
+        return created, updated, deleted
 
     @classmethod
     def find_by_id(cls, id):
          return cls.query.filter(Message.id == id).first()
 
-    @classmethod
-    def find_all(cls, page):
-        return cls.query.paginate(page, app.config['MESSAGES_PER_PAGE'], False)
+
+search.install(Message.__table__)
 
 
 class MessageRequestSchema(ma.Schema):
@@ -57,10 +169,15 @@ class MessageRequestSchema(ma.Schema):
         ])
 
 
+class MessageBatchUpdateSchema(MessageRequestSchema):
+    id = fields.Integer(required=True, strict=True)
+
+
 class MessageResponseSchema(ma.SQLAlchemySchema):
     class Meta:
         model = Message
-        fields = ('id', 'date_created', 'date_modified', 'content', 'palindrome',)
+        fields = ('id', 'date_created', 'date_modified', 'content', 'palindrome',
+                  'longest_palindrome', 'longest_palindrome_start', 'longest_palindrome_end')
 
     id              = fields.Integer(required=False)
     date_created    = fields.DateTime(required=False, dump_only=True)
@@ -70,8 +187,7 @@ class MessageResponseSchema(ma.SQLAlchemySchema):
                             validate.Length(min=1, max=255, error='Lenght must be between {min} and {max} charcaters.'),
                             _validate_notblank
                         ])
-    palindrome      = fields.Method('_palindrome', dump_only=True,  metadata={'doc_default': False})
-
-    @staticmethod
-    def _palindrome(obj):
-        return is_palindrome(obj.content)
+    palindrome      = fields.Boolean(dump_only=True, metadata={'doc_default': False})
+    longest_palindrome       = fields.String(dump_only=True, allow_none=True)
+    longest_palindrome_start = fields.Integer(dump_only=True, allow_none=True)
+    longest_palindrome_end   = fields.Integer(dump_only=True, allow_none=True)
@@ -0,0 +1,151 @@
+import os
+import threading
+import multiprocessing
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+from .models import is_palindrome
+
+
+MODES = ('strict', 'alnum', 'casefold')
+
+
+# the non alphanumeric ASCII characters, dropped by str.translate
+_NOT_ALNUM = {c: None for c in range(128) if not chr(c).isalnum()}
+
+# pairs of characters compared from both ends before comparing the whole
+# string: most strings that are not palindromes differ there
+PROBE = 8
+
+
+def _probe(text, skip):
+    """Two-pointer check of the first PROBE pairs of an ASCII string, case
+    insensitive, skipping the non alphanumeric characters when `skip`.
+    Returns False on a mismatch, True when the whole string was checked and
+    None when it has to be compared as a whole. Nothing is copied: the
+    single ASCII characters are cached by the interpreter."""
+    i, j = 0, len(text) - 1
+    for _ in range(PROBE):
+        if skip:
+            while i < j and not text[i].isalnum():
+                i += 1
+            while i < j and not text[j].isalnum():
+                j -= 1
+        if i >= j:
+            return True
+        a, b = text[i], text[j]
+        if a != b and a.lower() != b.lower():
+            return False
+        i += 1
+        j -= 1
+    return None
+
+
+def _casefolded(text):
+    text = unicodedata.normalize('NFC', text).casefold()
+    return ''.join(c for c in text if c.isalnum())
+
+
+def check(text, mode='strict'):
+    """Whether `text` is a palindrome.
+
+    strict: same as is_palindrome, only alphanumeric characters are allowed
+    alnum: the non alphanumeric characters are ignored
+    casefold: same as alnum, with Unicode normalization and case folding
+    """
+    if not isinstance(text, str):
+        return False
+    if mode == 'strict':
+        # short strings are faster to copy than to walk
+        if len(text) > 2 * PROBE and text.isascii() and _probe(text, skip=False) is False:
+            return False
+        return is_palindrome(text)
+    if text.isascii():
+        result = _probe(text, skip=True)
+        if result is None:
+            # casefold is lower for ASCII
+            text = text.translate(_NOT_ALNUM).lower()
+            result = text == text[::-1]
+        return result
+    # lowercasing or case folding may change the length of non ASCII strings,
+    # they are normalized as a whole
+    if mode == 'alnum':
+        text = ''.join(c for c in text.lower() if c.isalnum())
+    else:
+        text = _casefolded(text)
+    return text == text[::-1]
+
+
+def _check_chunk(texts, mode):
+    return [check(text, mode) for text in texts]
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _pool_context():
+    # not fork: the workers of the app run request, enricher and coalescer
+    # threads, a forked child could inherit locks they hold and deadlock.
+    # The fork server starts single threaded, with this module imported once
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def _get_pool(workers):
+    # one pool per process, a forked worker does not reuse its parent's
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context())
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def classify(texts, mode='strict', workers=0, threshold=1000000):
+    """Checks every text, spreading batches of at least `threshold`
+    characters over a pool of `workers` processes: below that, sending the
+    texts to the pool costs more than checking them."""
+    if workers < 2 or sum(map(len, texts)) < threshold:
+        return _check_chunk(texts, mode)
+
+    size = -(-len(texts) // workers)
+    chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+    pool = _get_pool(workers)
+    results = []
+    for chunk in pool.map(_check_chunk, chunks, [mode] * len(chunks)):
+        results.extend(chunk)
+    return results
+
+
+_SEPARATOR = object()
+
+
+def longest_palindrome(text):
+    """Span (start, end) of the longest palindromic substring of `text`,
+    case insensitive, the first one on ties. Manacher's algorithm, linear
+    in the length of the text."""
+    # odd and even length palindromes are handled alike by interleaving
+    # separators: every palindrome of the interleaved sequence is odd
+    chars = [_SEPARATOR] * (2 * len(text) + 1)
+    chars[1::2] = [c.lower() for c in text]
+    size = len(chars)
+    radius = [0] * size
+    center = right = 0
+    best_radius = best_center = 0
+    for i in range(size):
+        if i < right:
+            radius[i] = min(right - i, radius[2 * center - i])
+        while i - radius[i] > 0 and i + radius[i] + 1 < size and \
+                chars[i - radius[i] - 1] == chars[i + radius[i] + 1]:
+            radius[i] += 1
+        if i + radius[i] > right:
+            center, right = i, i + radius[i]
+        if radius[i] > best_radius:
+            best_radius, best_center = radius[i], i
+    start = (best_center - best_radius) // 2
+    return start, start + best_radius
@@ -0,0 +1,170 @@
+import re
+import json
+import time
+from contextlib import contextmanager
+
+from flask import g, request, has_request_context
+from flask import current_app as app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# order of the phases in Server-Timing, the db phase is the time of the
+# SQL statements, the others are measured with phase()
+PHASES = ('parse', 'validate', 'db', 'serialize', 'encode', 'compress')
+
+_NORMALIZERS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%\(\w+\)s|%s|(?<!:):\w+'), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def normalize(statement):
+    """Replaces the literals and bound parameters of a statement by ? and
+    the lists of them by (...), so that the executions of a query with
+    different values aggregate together."""
+    for pattern, replacement in _NORMALIZERS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+class RequestProfile:
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = clock()
+        self.phases = {}
+        self.statements = []
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0) + seconds
+
+    def timings(self):
+        """The time of each phase in seconds, the db phase included."""
+        phases = dict(self.phases)
+        if self.statements:
+            phases['db'] = sum(seconds for _, seconds in self.statements)
+        return phases
+
+    def server_timing(self, total):
+        phases = self.timings()
+        names = [name for name in PHASES if name in phases] + \
+            sorted(name for name in phases if name not in PHASES)
+        timings = []
+        for name in names:
+            timing = '{};dur={:.3f}'.format(name, phases[name] * 1000)
+            if name == 'db':
+                timing += ';desc="{} queries"'.format(len(self.statements))
+            timings.append(timing)
+        timings.append('total;dur={:.3f}'.format(total * 1000))
+        return ', '.join(timings)
+
+    def queries(self):
+        """The statements grouped by normalized form, slowest first."""
+        grouped = {}
+        for statement, seconds in self.statements:
+            query = grouped.setdefault(normalize(statement), {'count': 0, 'duration_ms': 0})
+            query['count'] += 1
+            query['duration_ms'] += seconds * 1000
+        return sorted(({'statement': statement, 'count': query['count'],
+                        'duration_ms': round(query['duration_ms'], 3)}
+                       for statement, query in grouped.items()),
+                      key=lambda query: query['duration_ms'], reverse=True)
+
+
+def current_profile():
+    return g.get('_profile') if has_request_context() else None
+
+
+@contextmanager
+def phase(name):
+    """Adds the time spent in the block to the `name` phase of the request
+    being profiled, does nothing when the profiler is disabled."""
+    profile = current_profile()
+    if profile is None:
+        yield
+        return
+    started = profile.clock()
+    try:
+        yield
+    finally:
+        profile.add(name, profile.clock() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile() is not None:
+        conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile()
+    started = conn.info.get('profile_started')
+    if profile is not None and started:
+        profile.statements.append((statement, time.perf_counter() - started.pop()))
+
+
+class Profiler:
+    """Opt-in per-request profiler, enabled by REQUEST_PROFILING.
+
+    Every response gets a Server-Timing header with the time of each phase
+    and of the SQL statements. Requests slower than PROFILER_SLOW_REQUEST_MS
+    and statements slower than PROFILER_SLOW_QUERY_MS are logged as JSON,
+    with normalized statements.
+    """
+
+    _listening = False
+
+    def init_app(self, app):
+        app.config.setdefault('REQUEST_PROFILING', False)
+        app.config.setdefault('PROFILER_SLOW_REQUEST_MS', 500)
+        app.config.setdefault('PROFILER_SLOW_QUERY_MS', 100)
+        if not app.config['REQUEST_PROFILING']:
+            return
+
+        if not Profiler._listening:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            Profiler._listening = True
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    @staticmethod
+    def _before_request():
+        g._profile = RequestProfile()
+
+    @staticmethod
+    def _after_request(response):
+        profile = g.pop('_profile', None)
+        if profile is None:
+            return response
+        total = profile.clock() - profile.started
+        response.headers['Server-Timing'] = profile.server_timing(total)
+
+        route = request.url_rule.rule if request.url_rule else request.path
+        slow_query = app.config['PROFILER_SLOW_QUERY_MS'] / 1000
+        for statement, seconds in profile.statements:
+            if seconds >= slow_query:
+                app.logger.warning(json.dumps({
+                    'event': 'slow_query',
+                    'method': request.method,
+                    'route': route,
+                    'statement': normalize(statement),
+                    'duration_ms': round(seconds * 1000, 3),
+                }, sort_keys=True))
+
+        if total >= app.config['PROFILER_SLOW_REQUEST_MS'] / 1000:
+            app.logger.warning(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'route': route,
+                'status': response.status_code,
+                'duration_ms': round(total * 1000, 3),
+                'phases': {name: round(seconds * 1000, 3)
+                           for name, seconds in profile.timings().items()},
+                'queries': profile.queries(),
+            }, sort_keys=True))
+        return response
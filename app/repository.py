@@ -0,0 +1,103 @@
+from http import HTTPStatus
+from sqlalchemy import select, func, table, column, literal_column
+from flask import current_app as app
+
+from . import db, search
+from .exceptions import WebserviceException
+from .models import Message, MessageResponseSchema
+
+
+message = Message.__table__
+message_fts = table('message_fts', column('rowid'))
+
+
+# read-only queries through SQLAlchemy Core, they return plain rows instead of
+# ORM instances since the rows only feed the response serializers
+def _columns(fields=None):
+    # the id is always selected, the cursors are made of it
+    names = dict.fromkeys(('id',) + tuple(fields or MessageResponseSchema.Meta.fields))
+    return [message.c[name] for name in names]
+
+
+def _select(palindrome=None, fields=None):
+    """SELECT of the response `fields` of the messages, all of them by
+    default."""
+    query = select(*_columns(fields))
+    if palindrome is not None:
+        query = query.where(message.c.palindrome == palindrome)
+    return query
+
+
+def find_by_id(id, fields=None):
+    return db.session.execute(_select(fields=fields).where(message.c.id == id)).first()
+
+
+def find_by_ids(ids, fields=None):
+    """Resolves all the given ids with a single query, returns a dict of the
+    rows found by id."""
+    if not ids:
+        return {}
+    rows = db.session.execute(_select(fields=fields).where(message.c.id.in_(ids)))
+    return {row.id: row for row in rows}
+
+
+def find_after(last_id, limit, palindrome=None, fields=None):
+    """Returns up to `limit` rows with an id greater than `last_id` and
+    whether more rows follow them."""
+    query = _select(palindrome, fields).order_by(message.c.id).limit(limit + 1)
+    if last_id is not None:
+        query = query.where(message.c.id > last_id)
+    rows = db.session.execute(query).all()
+    return rows[:limit], len(rows) > limit
+
+
+def find_page(page, per_page, palindrome=None, fields=None):
+    """Offset pagination without the COUNT(*): returns the rows of `page`,
+    whether there is a next page and whether there is a previous one."""
+    page = max(page, 1)
+    query = _select(palindrome, fields).order_by(message.c.id)\
+        .offset((page - 1) * per_page).limit(per_page + 1)
+    rows = db.session.execute(query).all()
+    return rows[:per_page], len(rows) > per_page, page > 1
+
+
+def search_select(dialect, terms, offset, limit, palindrome=None, fields=None):
+    """Matching messages through the full-text index, best ranked first,
+    `limit + 1` of them to tell whether more follow."""
+    if dialect == 'sqlite':
+        fts = literal_column('message_fts')
+        query = _select(palindrome, fields)\
+            .join(message_fts, message_fts.c.rowid == message.c.id)\
+            .where(fts.op('MATCH')(search.fts5_query(terms)))\
+            .order_by(func.bm25(fts), message.c.id)
+    elif dialect == 'mysql':
+        relevance = message.c.content.match(search.mysql_query(terms))
+        query = _select(palindrome, fields).where(relevance)\
+            .order_by(relevance.desc(), message.c.id)
+    else:
+        raise WebserviceException(
+            message='Search is not supported by this database.',
+            code=HTTPStatus.NOT_IMPLEMENTED
+        )
+    return query.offset(offset).limit(limit + 1)
+
+
+def search_messages(terms, offset, limit, palindrome=None, fields=None):
+    """Returns up to `limit` matching rows from `offset` on, in rank order,
+    and whether more rows follow them."""
+    connection = db.session.connection()
+    rows = connection.execute(
+        search_select(connection.dialect.name, terms, offset, limit, palindrome, fields)).all()
+    return rows[:limit], len(rows) > limit
+
+
+def stream(since_id=None, since_modified=None, fields=None):
+    """Iterates over the rows in id order, fetched in batches through a
+    server side cursor so memory does not grow with the table."""
+    query = _select(fields=fields).order_by(message.c.id)
+    if since_id is not None:
+        query = query.where(message.c.id > since_id)
+    if since_modified is not None:
+        query = query.where(message.c.date_modified >= since_modified)
+    result = db.session.execute(query, execution_options={'stream_results': True})
+    return result.yield_per(app.config['MESSAGES_EXPORT_BATCH_SIZE'])
@@ -0,0 +1,123 @@
+import time
+import itertools
+import threading
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, event, exc, orm
+from sqlalchemy.engine import make_url
+
+
+READ_PRIMARY_COOKIE = 'read_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaPool:
+    """Round-robin over the read replica engines. A replica whose connections
+    fail is ejected for `eject_seconds`, next() returns None when all of them
+    are ejected."""
+
+    def __init__(self, engines, eject_seconds=30, clock=time.monotonic):
+        self.engines = engines
+        self.eject_seconds = eject_seconds
+        self.clock = clock
+        self._ejected = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        for engine in engines:
+            event.listen(engine, 'handle_error', self._on_error)
+
+    def next(self):
+        now = self.clock()
+        with self._lock:
+            for _ in range(len(self.engines)):
+                engine = self.engines[next(self._counter) % len(self.engines)]
+                if self._ejected.get(engine, 0) <= now:
+                    return engine
+        return None
+
+    def eject(self, engine):
+        with self._lock:
+            self._ejected[engine] = self.clock() + self.eject_seconds
+
+    def _on_error(self, context):
+        if context.is_disconnect or \
+                isinstance(context.sqlalchemy_exception, exc.OperationalError):
+            self.eject(context.engine)
+
+
+def _reads_from_replica():
+    if not has_request_context() or request.method not in SAFE_METHODS:
+        return False
+    if g.get('_db_primary'):
+        return False
+    # read-your-writes: the client wrote recently, the replicas may lag
+    until = request.cookies.get(READ_PRIMARY_COOKIE, type=float)
+    return not until or until < time.time()
+
+
+class RoutingSession(SignallingSession):
+    """Session that sends the reads of safe (GET) requests to a read replica,
+    everything else, including any flush, goes to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replicas = self.app.extensions.get('replicas')
+        if replicas and not self._flushing and _reads_from_replica():
+            # stick to one replica for the whole request
+            engine = g.get('_db_replica') or replicas.next()
+            if engine is not None:
+                g._db_replica = engine
+                return engine
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """SQLAlchemy extension with optional read replicas.
+
+    SQLALCHEMY_REPLICA_URIS lists the replicas, REPLICA_EJECT_SECONDS is how
+    long a failing replica is left out and READ_YOUR_WRITES_SECONDS is how
+    long the reads of a client that wrote stay on the primary (0 disables it).
+    """
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_EJECT_SECONDS', 30)
+        app.config.setdefault('READ_YOUR_WRITES_SECONDS', 5)
+        super().init_app(app)
+
+        engines = []
+        for uri in app.config['SQLALCHEMY_REPLICA_URIS']:
+            url, options = self.apply_driver_hacks(app, make_url(uri), {'pool_pre_ping': True})
+            engines.append(create_engine(url, **options))
+        app.extensions['replicas'] = \
+            ReplicaPool(engines, app.config['REPLICA_EJECT_SECONDS']) if engines else None
+
+        window = app.config['READ_YOUR_WRITES_SECONDS']
+        if engines and window:
+            @app.after_request
+            def read_your_writes(response):
+                if request.method not in SAFE_METHODS and response.status_code < 400:
+                    response.set_cookie(READ_PRIMARY_COOKIE, str(time.time() + window),
+                                        max_age=window, httponly=True)
+                return response
+
+    def recreate_pools(self, app):
+        """Gives the engines of `app` new empty pools, in a forked worker:
+        the connections of the parent are left to it, not closed."""
+        replicas = app.extensions.get('replicas')
+        for engine in [self.get_engine(app)] + (replicas.engines if replicas else []):
+            engine.pool = engine.pool.recreate()
+
+    @contextmanager
+    def primary(self):
+        """Sends the reads made within the block to the primary."""
+        previous = g.get('_db_primary')
+        g._db_primary = True
+        try:
+            yield
+        finally:
+            g._db_primary = previous
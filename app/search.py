@@ -0,0 +1,60 @@
+import re
+from sqlalchemy import DDL, event
+
+
+# Full-text index of message.content: an external content FTS5 table kept
+# in sync by triggers on SQLite, a FULLTEXT index on MySQL. Both are created
+# along with the message table (create_all) and by the migration.
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE message_fts USING fts5("
+    "content, content='message', content_rowid='id')",
+    "CREATE TRIGGER message_fts_insert AFTER INSERT ON message BEGIN "
+    "INSERT INTO message_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER message_fts_delete AFTER DELETE ON message BEGIN "
+    "INSERT INTO message_fts(message_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER message_fts_update AFTER UPDATE OF content ON message BEGIN "
+    "INSERT INTO message_fts(message_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); "
+    "INSERT INTO message_fts(rowid, content) VALUES (new.id, new.content); END",
+]
+SQLITE_REBUILD = "INSERT INTO message_fts(message_fts) VALUES ('rebuild')"
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS message_fts_update",
+    "DROP TRIGGER IF EXISTS message_fts_delete",
+    "DROP TRIGGER IF EXISTS message_fts_insert",
+    "DROP TABLE IF EXISTS message_fts",
+]
+MYSQL_CREATE = ["CREATE FULLTEXT INDEX ix_message_content_fulltext ON message (content)"]
+MYSQL_DROP = ["DROP INDEX ix_message_content_fulltext ON message"]
+
+DIALECTS = ('sqlite', 'mysql')
+MAX_TERMS = 16
+
+_WORD = re.compile(r'\w+')
+
+
+def install(table):
+    """Creates and drops the full-text index along with `table`."""
+    for statement in SQLITE_CREATE:
+        event.listen(table, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    for statement in MYSQL_CREATE:
+        event.listen(table, 'after_create', DDL(statement).execute_if(dialect='mysql'))
+    for statement in SQLITE_DROP:
+        event.listen(table, 'before_drop', DDL(statement).execute_if(dialect='sqlite'))
+
+
+def parse_terms(q):
+    """Splits a search query into words, any query syntax is dropped so
+    that user input cannot produce an invalid full-text query."""
+    return _WORD.findall(q)[:MAX_TERMS]
+
+
+def fts5_query(terms):
+    # quoted strings, all of them must match
+    return ' '.join('"{}"'.format(term) for term in terms)
+
+
+def mysql_query(terms):
+    # boolean mode, all of them must match
+    return ' '.join('+{}'.format(term) for term in terms)
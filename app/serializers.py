@@ -0,0 +1,98 @@
+from json.encoder import encode_basestring_ascii
+from marshmallow import fields
+from flask import json as flask_json
+from flask import current_app as app
+
+from .models import MessageResponseSchema
+from .profiler import phase
+
+
+def _null(convert):
+    def encode(value):
+        return 'null' if value is None else convert(value)
+    return encode
+
+
+_ENCODERS = {
+    fields.Integer: _null(lambda value: str(int(value))),
+    fields.String: _null(encode_basestring_ascii),
+    fields.DateTime: _null(lambda value: '"%s"' % value.isoformat()),
+    fields.Boolean: _null(lambda value: 'true' if value else 'false'),
+}
+
+
+class MarshmallowSerializer:
+    """Serializes messages through MessageResponseSchema."""
+
+    def __init__(self, only=None):
+        self.schema = MessageResponseSchema(only=only)
+
+    def dumps(self, msg):
+        return flask_json.dumps(self.schema.dump(msg), separators=(',', ':'))
+
+
+class FastSerializer:
+    """Serializes messages to the same JSON as MarshmallowSerializer without
+    going through marshmallow: the schema fields are compiled once into a
+    format string and one encoder per field."""
+
+    def __init__(self, only=None):
+        schema = MessageResponseSchema(only=only)
+        keys = []
+        self._fields = []
+        for name, field in sorted(schema.dump_fields.items(),
+                                  key=lambda item: item[1].data_key or item[0]):
+            encoder = _ENCODERS.get(type(field))
+            if encoder is None or (isinstance(field, fields.DateTime) and
+                                   field.format not in (None, 'iso')):
+                raise ValueError('Cannot compile field {} ({}).'.format(name, type(field).__name__))
+            keys.append(field.data_key or name)
+            self._fields.append((field.attribute or name, encoder))
+        self._template = '{%s}' % ','.join(
+            '%s:%%s' % encode_basestring_ascii(key).replace('%', '%%') for key in keys)
+
+    def dumps(self, msg):
+        return self._template % tuple(
+            encode(getattr(msg, attribute)) for attribute, encode in self._fields)
+
+
+SERIALIZERS = {
+    'marshmallow': MarshmallowSerializer,
+    'fast': FastSerializer,
+}
+
+
+def get_serializer(only=None):
+    """Returns the serializer selected by MESSAGE_SERIALIZER."""
+    serializers = app.extensions.setdefault('message_serializers', {})
+    key = tuple(only) if only else None
+    serializer = serializers.get(key)
+    if serializer is None:
+        serializer = SERIALIZERS[app.config['MESSAGE_SERIALIZER']](only=only)
+        serializers[key] = serializer
+    return serializer
+
+
+def encode_object(raw=None, **values):
+    """Encodes a JSON object made of already encoded `raw` members and
+    plain `values`, with sorted keys like jsonify."""
+    members = {key: flask_json.dumps(value, separators=(',', ':'))
+               for key, value in values.items()}
+    members.update(raw or {})
+    return '{%s}' % ','.join(
+        '%s:%s' % (encode_basestring_ascii(key), members[key]) for key in sorted(members))
+
+
+def encode_list(items):
+    return '[%s]' % ','.join(items)
+
+
+def json_response(status, raw=None, **values):
+    """Same as jsonify(**values) with the `raw` members inlined as is."""
+    with phase('encode'):
+        body = (encode_object(raw, **values) + '\n').encode()
+    return app.response_class(
+        body,
+        status=status,
+        mimetype=app.config['JSONIFY_MIMETYPE']
+    )
@@ -0,0 +1,35 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupProfile:
+    """Times the steps of create_app, including the imports they trigger.
+    Disabled unless STARTUP_PROFILE is set, then it logs one line per step."""
+
+    def __init__(self, enabled=False, clock=time.perf_counter):
+        self.enabled = enabled
+        self.clock = clock
+        self.steps = []
+
+    def record(self, name, seconds):
+        if self.enabled:
+            self.steps.append((name, seconds))
+
+    @contextmanager
+    def step(self, name):
+        if not self.enabled:
+            yield
+            return
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.steps.append((name, self.clock() - started))
+
+    def report(self, logger):
+        if not self.enabled:
+            return
+        for name, seconds in self.steps:
+            logger.info('startup %-12s %8.1f ms', name, seconds * 1000)
+        logger.info('startup %-12s %8.1f ms', 'total',
+                    sum(seconds for _, seconds in self.steps) * 1000)
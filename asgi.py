@@ -0,0 +1,12 @@
+import sys
+import os
+
+from app.aio import create_asgi_app
+
+env = os.environ.get('ENV_NAME')
+application = create_asgi_app(env)
+sys.path.insert(1, os.path.dirname(os.path.realpath(__file__)))
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(application)
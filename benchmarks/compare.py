@@ -0,0 +1,48 @@
+"""Compares two result files of the benchmarks.
+
+    python -m benchmarks.compare baseline.json current.json
+"""
+import json
+import argparse
+
+
+COLUMNS = ('throughput', 'p50', 'p95', 'p99')
+
+
+def _change(before, after):
+    if before is None or after is None or not before:
+        return '-'
+    return '{:+.1f}%'.format((after - before) / before * 100)
+
+
+def compare(baseline, current):
+    """name -> column -> (baseline, current, change) for the benchmarks in both."""
+    result = {}
+    for name, after in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is not None:
+            result[name] = {column: (before.get(column), after.get(column),
+                                     _change(before.get(column), after.get(column)))
+                            for column in COLUMNS}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    print('{:<28}'.format('benchmark') + ''.join('  {:>26}'.format(c) for c in COLUMNS))
+    for name, columns in compare(baseline, current).items():
+        print('{:<28}'.format(name) + ''.join(
+            '  {:>26}'.format('{} -> {} ({})'.format(*columns[c])) for c in COLUMNS))
+
+
+if __name__ == '__main__':
+    main()
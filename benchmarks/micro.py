@@ -0,0 +1,84 @@
+"""Micro-benchmarks of the palindrome check and of the message serialization.
+
+    python -m benchmarks.micro --output micro.json
+"""
+import timeit
+import argparse
+from datetime import datetime
+from types import SimpleNamespace
+
+from .stats import summarize, metadata, save, print_table
+
+
+PALINDROMES = {
+    'short': 'A man, a plan, a canal: Panama',
+    'long': 'ab' * 5000 + 'a' + 'ba' * 5000,
+    'long_mismatch': 'ab' * 5000 + 'c' + 'ab' * 5000,
+    'unicode': 'Ésope reste ici et se repose. ' * 100,
+}
+
+
+def _message(i):
+    now = datetime(2021, 4, 1, 12, 30, 15, 123456)
+    return SimpleNamespace(id=i, content='Was it a car or a cat I saw {}'.format(i),
+                           palindrome=False, date_created=now, date_modified=now)
+
+
+def benchmarks():
+    """name -> statement of every micro-benchmark."""
+    from app.models import is_palindrome, MessageResponseSchema
+    from app.palindromes import MODES, check
+    from app.serializers import MarshmallowSerializer, FastSerializer
+
+    msgs = [_message(i) for i in range(100)]
+    result = {}
+    for name, text in PALINDROMES.items():
+        result['is_palindrome_' + name] = lambda text=text: is_palindrome(text)
+        for mode in MODES:
+            result['check_{}_{}'.format(mode, name)] = \
+                lambda text=text, mode=mode: check(text, mode)
+
+    schema = MessageResponseSchema()
+    many = MessageResponseSchema(many=True)
+    marshmallow, fast = MarshmallowSerializer(), FastSerializer()
+
+    result['schema_dump'] = lambda: schema.dump(msgs[0])
+    result['schema_dump_many_100'] = lambda: many.dump(msgs)
+    result['marshmallow_dumps'] = lambda: marshmallow.dumps(msgs[0])
+    result['fast_dumps'] = lambda: fast.dumps(msgs[0])
+    return result
+
+
+def run(statement, repeat, number):
+    """Times `repeat` rounds of `number` calls, one latency sample per round
+    divided by `number`."""
+    timings = timeit.repeat(statement, repeat=repeat, number=number)
+    samples = [timing / number for timing in timings]
+    result = summarize(samples, sum(timings), unit='us')
+    result['throughput'] = round(repeat * number / sum(timings), 1)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50, help='Rounds per benchmark.')
+    parser.add_argument('--number', type=int, default=100, help='Calls per round.')
+    parser.add_argument('--only', nargs='+', metavar='BENCHMARK', help='Benchmarks to run.')
+    parser.add_argument('--output', help='Writes the results as JSON to this file.')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, statement in benchmarks().items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = run(statement, args.repeat, args.number)
+
+    print_table(results, columns=('throughput', 'p50', 'p95', 'p99'))
+    if args.output:
+        save(args.output, metadata(benchmark='micro', repeat=args.repeat, number=args.number),
+             results)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Compares the gunicorn worker models of gunicorn.conf.py.
+
+Starts gunicorn once per mode on a local port, runs the load benchmark
+against it over HTTP and reports the results of every mode side by side:
+
+    python -m benchmarks.serving --modes sync gthread --output serving.json
+
+The server uses the DEV config on a temporary SQLite database by default,
+pass --env PROD with the DB_* variables set to benchmark against MySQL.
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+import urllib.error
+
+from . import load
+from .stats import metadata, save, print_table
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# GUNICORN_* settings of each mode, on top of the defaults of gunicorn.conf.py
+MODES = {
+    'sync': {'GUNICORN_WORKER_CLASS': 'sync'},
+    'sync-no-preload': {'GUNICORN_WORKER_CLASS': 'sync', 'GUNICORN_PRELOAD': 'false'},
+    'gthread': {'GUNICORN_WORKER_CLASS': 'gthread'},
+    'asgi': {'SERVING_MODE': 'asgi'},
+}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_healthy(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited with status {}'.format(process.returncode))
+        try:
+            with urllib.request.urlopen(url + '/api/v1/healthcheck'):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn did not become healthy within {}s'.format(timeout))
+
+
+def create_schema(env, database_uri=None):
+    from app import create_app, db
+
+    app = create_app(env)
+    if database_uri:
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    with app.app_context():
+        db.create_all()
+
+
+def serve(mode, env, port, database_uri=None, workers=None, threads=None):
+    """Starts gunicorn in `mode`, returns its process."""
+    environ = dict(os.environ, ENV_NAME=env, LOG_LEVEL='WARNING',
+                   GUNICORN_BIND='127.0.0.1:{}'.format(port), GUNICORN_ACCESSLOG=os.devnull,
+                   PROMETHEUS_MULTIPROC_DIR=tempfile.mkdtemp(prefix='prometheus-'))
+    environ.update(MODES[mode])
+    if database_uri:
+        environ['DEV_DATABASE_URI'] = database_uri
+    if workers:
+        environ['GUNICORN_WORKERS'] = str(workers)
+    if threads:
+        environ['GUNICORN_THREADS'] = str(threads)
+    app = 'asgi:application' if environ.get('SERVING_MODE') == 'asgi' else 'wsgi'
+    return subprocess.Popen([sys.executable, '-m', 'gunicorn.app.wsgiapp', '-c', 'gunicorn.conf.py', app],
+                            cwd=ROOT, env=environ)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    # asgi needs uvloop and httptools, the dependencies of the uvicorn worker
+    parser.add_argument('--modes', nargs='+', choices=list(MODES),
+                        default=['sync', 'sync-no-preload', 'gthread'])
+    parser.add_argument('--env', default='DEV')
+    parser.add_argument('--workers', type=int,
+                        help='Workers of every mode, derived from the CPUs by default.')
+    parser.add_argument('--threads', type=int, help='Threads of the gthread workers.')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per benchmark.')
+    parser.add_argument('--messages', type=int, default=1000, help='Messages seeded first.')
+    parser.add_argument('--only', nargs='+', metavar='BENCHMARK', help='Load benchmarks to run.')
+    parser.add_argument('--output', help='Writes the results as JSON to this file.')
+    args = parser.parse_args(argv)
+
+    database_uri = None
+    if args.env == 'DEV':
+        database_uri = os.environ.get('DEV_DATABASE_URI') or 'sqlite:///{}'.format(
+            tempfile.NamedTemporaryFile(suffix='.db', delete=False).name)
+    create_schema(args.env, database_uri)
+
+    results = {}
+    for mode in args.modes:
+        port = _free_port()
+        process = serve(mode, args.env, port, database_uri, args.workers, args.threads)
+        try:
+            url = 'http://127.0.0.1:{}'.format(port)
+            _wait_healthy(url, process)
+            load_args = ['--url', url, '--requests', str(args.requests),
+                         '--messages', str(args.messages), '--concurrency', str(args.concurrency)]
+            if args.only:
+                load_args += ['--only'] + args.only
+            for name, result in load.main(load_args).items():
+                results['{}/{}'.format(mode, name)] = result
+        finally:
+            process.terminate()
+            process.wait()
+
+    print()
+    print_table(results)
+    if args.output:
+        save(args.output, metadata(benchmark='serving', env=args.env, modes=args.modes,
+                                   workers=args.workers, threads=args.threads,
+                                   concurrency=args.concurrency, requests=args.requests,
+                                   messages=args.messages), results)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import json
+import math
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return None
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+UNITS = {'ms': 1e3, 'us': 1e6}
+
+
+def summarize(latencies, elapsed, errors=0, unit='ms'):
+    """Summary of a run: `latencies` in seconds, `elapsed` the wall time of
+    the whole run, the latencies are reported in `unit`."""
+    values = sorted(latencies)
+    scaled = lambda value: None if value is None else round(value * UNITS[unit], 3)
+    return {
+        'unit': unit,
+        'requests': len(values),
+        'errors': errors,
+        'elapsed': round(elapsed, 3),
+        'throughput': round(len(values) / elapsed, 1) if elapsed else None,
+        'mean': scaled(sum(values) / len(values)) if values else None,
+        'p50': scaled(percentile(values, 0.50)),
+        'p95': scaled(percentile(values, 0.95)),
+        'p99': scaled(percentile(values, 0.99)),
+        'max': scaled(values[-1]) if values else None,
+    }
+
+
+def _revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(**values):
+    values.update(
+        date=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        revision=_revision(),
+        python=platform.python_version(),
+        machine=platform.machine(),
+    )
+    return values
+
+
+def save(path, meta, results):
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def print_table(results, columns=('requests', 'errors', 'throughput', 'p50', 'p95', 'p99')):
+    print('{:<28}'.format('benchmark') + ''.join('{:>12}'.format(c) for c in columns))
+    for name, result in results.items():
+        print('{:<28}'.format(name) + ''.join(
+            '{:>12}'.format('-' if result.get(c) is None else result[c]) for c in columns))
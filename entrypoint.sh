@@ -10,5 +10,14 @@ while true; do
     sleep 5
 done
 
+# metrics of all the workers, emptied on every start
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# workers, worker class, preload, recycling and keep-alive: see gunicorn.conf.py
 echo "Running messages webservice"
-/usr/local/bin/gunicorn -b 0.0.0.0:80 --access-logfile - --error-logfile - wsgi
\ No newline at end of file
+if [[ "$SERVING_MODE" == "asgi" ]]; then
+    exec /usr/local/bin/gunicorn -c gunicorn.conf.py asgi:application
+else
+    exec /usr/local/bin/gunicorn -c gunicorn.conf.py wsgi
+fi
\ No newline at end of file
@@ -0,0 +1,118 @@
+# gunicorn settings, loaded by entrypoint.sh with --config. Each of them can
+# be overridden with its GUNICORN_* environment variable.
+import math
+import os
+
+from prometheus_client import multiprocess
+
+
+def _env(name, default, convert=str):
+    value = os.environ.get(name)
+    return convert(value) if value else default
+
+
+def _flag(value):
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def cgroup_cpus(root='/sys/fs/cgroup'):
+    """CPU quota of the container from its cgroup (v2, then v1), None if
+    it has none."""
+    try:
+        with open(os.path.join(root, 'cpu.max')) as f:
+            quota, period = f.read().split()
+        return None if quota == 'max' else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    for controller in ('cpu', 'cpu,cpuacct'):
+        try:
+            with open(os.path.join(root, controller, 'cpu.cfs_quota_us')) as f:
+                quota = int(f.read())
+            with open(os.path.join(root, controller, 'cpu.cfs_period_us')) as f:
+                period = int(f.read())
+        except (OSError, ValueError):
+            continue
+        return quota / period if quota > 0 and period > 0 else None
+    return None
+
+
+def available_cpus(root='/sys/fs/cgroup'):
+    """CPUs the workers can use: the CPUs the process may run on, capped
+    by the cgroup quota (a pod CPU limit), rounded up."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpus(root)
+    if quota is not None:
+        cpus = min(cpus, quota)
+    return max(math.ceil(cpus), 1)
+
+
+def default_workers(worker_class, cpus):
+    # sync workers block on the database, 2 per CPU keep the CPUs busy;
+    # threaded and asyncio workers overlap their requests themselves
+    if worker_class == 'sync':
+        return 2 * cpus + 1
+    return cpus + 1
+
+
+bind = _env('GUNICORN_BIND', '0.0.0.0:80')
+
+# gthread (GUNICORN_THREADS per worker), sync or, for SERVING_MODE=asgi,
+# uvicorn.workers.UvicornWorker. A sync worker is killed when a request
+# runs past the timeout, the export and import ones take far longer: they
+# need gthread or asgi workers, whose heartbeat does not wait for requests
+worker_class = _env('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker'
+                    if os.environ.get('SERVING_MODE') == 'asgi' else 'gthread')
+threads = _env('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1, int)
+workers = _env('GUNICORN_WORKERS', default_workers(worker_class, available_cpus()), int)
+
+# passed on to the app: the processes that serve it (see
+# MESSAGE_CACHE_BACKEND) and the requests each of them handles at once (see
+# WRITE_COALESCING)
+os.environ['SERVER_WORKERS'] = str(workers)
+if not worker_class.startswith('uvicorn'):
+    os.environ['SERVER_THREADS'] = str(threads)
+
+# the app is created once in the master and shared copy-on-write with the
+# workers, see post_fork for the database connections
+preload_app = _env('GUNICORN_PRELOAD', True, _flag)
+
+# workers are recycled after max_requests requests, plus up to the jitter so
+# that they do not all restart at once
+max_requests = _env('GUNICORN_MAX_REQUESTS', 2000, int)
+max_requests_jitter = _env('GUNICORN_MAX_REQUESTS_JITTER', 200, int)
+
+# above the idle timeout of the ingress so that it closes the connections
+# it reuses, not gunicorn
+keepalive = _env('GUNICORN_KEEPALIVE', 75, int)
+backlog = _env('GUNICORN_BACKLOG', 2048, int)
+timeout = _env('GUNICORN_TIMEOUT', 30, int)
+# the requests still running when a worker is recycled or stopped get this
+# long to finish
+graceful_timeout = _env('GUNICORN_GRACEFUL_TIMEOUT', 30, int)
+# the heartbeat files in memory, a slow disk does not get workers killed
+worker_tmp_dir = _env('GUNICORN_WORKER_TMP_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else None)
+
+accesslog = _env('GUNICORN_ACCESSLOG', '-')
+errorlog = _env('GUNICORN_ERRORLOG', '-')
+
+
+def post_fork(server, worker):
+    # a preloaded app may have opened connections in the master: the worker
+    # starts from empty pools instead of sharing those sockets
+    if not server.cfg.preload_app:
+        return
+    application = server.app.wsgi()
+    state = getattr(application, 'state', None)
+    if state is not None:
+        engine = state.engine.sync_engine
+        engine.pool = engine.pool.recreate()
+    else:
+        application.extensions['sqlalchemy'].db.recreate_pools(application)
+
+
+def child_exit(server, worker):
+    # drop the live gauges of the worker from the /metrics aggregation
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,31 @@
+"""add message longest palindrome
+
+Revision ID: 4d8f1b6e2a77
+Revises: 9c4e7a2f5d31
+Create Date: 2026-10-18 20:41:07.226190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d8f1b6e2a77'
+down_revision = '9c4e7a2f5d31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the existing messages are enriched by `flask messages enrich`
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('longest_palindrome', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('longest_palindrome_start', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('longest_palindrome_end', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.drop_column('longest_palindrome_end')
+        batch_op.drop_column('longest_palindrome_start')
+        batch_op.drop_column('longest_palindrome')
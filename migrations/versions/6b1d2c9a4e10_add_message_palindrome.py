@@ -0,0 +1,56 @@
+"""add message palindrome
+
+Revision ID: 6b1d2c9a4e10
+Revises: f3615f067fef
+Create Date: 2026-10-18 09:12:41.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b1d2c9a4e10'
+down_revision = 'f3615f067fef'
+branch_labels = None
+depends_on = None
+
+
+def is_palindrome(content):
+    # frozen copy of app.models.is_palindrome at this revision, the
+    # backfill must not change with the application code
+    if not isinstance(content, str):
+        return False
+    if content and not content.isalnum():
+        return False
+    content = content.lower()
+    return content == content[::-1]
+
+
+def upgrade():
+    with op.batch_alter_table('message') as batch_op:
+        batch_op.add_column(sa.Column('palindrome', sa.Boolean(), nullable=False,
+                                      server_default=sa.false()))
+        batch_op.create_index(batch_op.f('ix_message_palindrome'), ['palindrome'], unique=False)
+
+    # backfill the flag for the existing messages
+    message = sa.table('message',
+        sa.column('id', sa.Integer),
+        sa.column('content', sa.String),
+        sa.column('palindrome', sa.Boolean),
+    )
+    conn = op.get_bind()
+    ids = [row.id for row in conn.execute(sa.select(message.c.id, message.c.content))
+           if is_palindrome(row.content)]
+    for i in range(0, len(ids), 1000):
+        conn.execute(
+            message.update()
+            .where(message.c.id.in_(ids[i:i + 1000]))
+            .values(palindrome=True)
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('message') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_message_palindrome'))
+        batch_op.drop_column('palindrome')
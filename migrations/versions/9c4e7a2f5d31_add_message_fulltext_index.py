@@ -0,0 +1,39 @@
+"""add message full-text index
+
+Revision ID: 9c4e7a2f5d31
+Revises: 6b1d2c9a4e10
+Create Date: 2026-10-18 19:02:13.518304
+
+"""
+from alembic import op
+
+from app import search
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e7a2f5d31'
+down_revision = '6b1d2c9a4e10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in search.SQLITE_CREATE:
+            op.execute(statement)
+        # index the existing messages
+        op.execute(search.SQLITE_REBUILD)
+    elif dialect == 'mysql':
+        for statement in search.MYSQL_CREATE:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in search.SQLITE_DROP:
+            op.execute(statement)
+    elif dialect == 'mysql':
+        for statement in search.MYSQL_DROP:
+            op.execute(statement)
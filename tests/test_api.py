@@ -89,6 +89,70 @@ class APITestCase(TestCase):
         self.assertEqual(msg.get('palindrome'), False)
         self.assertEqual(msg.get('id'), 1)
 
+    # batch
+    def test_batch_messages_success(self):
+        """
+        Create, update and delete messages in a single batch
+        """
+        for content in ['first', 'second']:
+            code, response = self._post(self.endpoint, {'content': content})
+            self.assertEqual(code, HTTPStatus.CREATED)
+
+        data = {
+            'create': [{'content': 'aba'}, {'content': 'third'}],
+            'update': [{'id': 1, 'content': 'first updated'}, {'id': 12, 'content': 'missing'}],
+            'delete': [2, 13],
+        }
+        code, response = self._post(self.endpoint + '/batch', data)
+        self.assertEqual(code, HTTPStatus.OK)
+
+        created = response.get('created')
+        self.assertEqual([item.get('status') for item in created], [201, 201])
+        self.assertEqual([item.get('message').get('id') for item in created], [3, 4])
+        self.assertEqual(created[0].get('message').get('palindrome'), True)
+
+        updated = response.get('updated')
+        self.assertEqual(updated[0].get('message').get('content'), 'first updated')
+        self.assertEqual(updated[1].get('error'), 'Message Not found')
+
+        deleted = response.get('deleted')
+        self.assertEqual(deleted[0], {'id': 2, 'status': 204})
+        self.assertEqual(deleted[1].get('error'), 'Message Not found')
+
+        code, response = self._get(self.endpoint + '?page=1')
+        self.assertEqual(
+            [msg.get('content') for msg in response.get('messages')],
+            ['first updated', 'aba', 'third'])
+
+    def test_batch_messages_fail_validation(self):
+        """
+        Attempt to apply a batch with invalid items, nothing must be written
+        """
+        data = {
+            'create': [{'content': 'valid'}, {'content': ' '}],
+            'update': [{'content': 'no id'}],
+            'delete': ['x'],
+        }
+        code, response = self._post(self.endpoint + '/batch', data)
+        self.assertEqual(code, HTTPStatus.BAD_REQUEST)
+        errors = response.get('errors')
+        self.assertEqual(sorted(errors.keys()), ['create', 'delete', 'update'])
+        self.assertEqual(list(errors.get('create').keys()), ['1'])
+
+        code, response = self._get(self.endpoint + '?page=1')
+        self.assertEqual(len(response.get('messages')), 0)
+
+    def test_batch_messages_too_large(self):
+        """
+        Attempt to apply a batch over the size limit, it is rejected before
+        its items are validated
+        """
+        self.app.config['MESSAGES_MAX_BATCH_SIZE'] = 2
+        data = {'create': [{'content': ' '}, {'content': ' '}], 'delete': ['x']}
+        code, response = self._post(self.endpoint + '/batch', data)
+        self.assertEqual(code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(response.get('error'), 'Batch cannot contain more than 2 items.')
+
     # get
     def test_get_message_fail(self):
         """
@@ -118,6 +182,94 @@ class APITestCase(TestCase):
         self.assertEqual(msg.get('palindrome'), palindrome)
         self.assertEqual(msg.get('content'), data.get('content'))
 
+    def test_get_message_conditional(self):
+        """
+        Get a message with If-None-Match / If-Modified-Since validators
+        """
+        code, response = self._post(self.endpoint, {'content': 'test message'})
+        url = '{}/{}'.format(self.endpoint, response.get('message').get('id'))
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        etag = response.headers['ETag']
+        last_modified = response.headers['Last-Modified']
+
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['ETag'], etag)
+
+        response = self.client.get(url, headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        self._put(self.endpoint, 1, {'content': 'updated'})
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_get_messages_conditional(self):
+        """
+        Get a page of messages with If-None-Match, the page changes once a message is added
+        """
+        self._post(self.endpoint, {'content': 'test message'})
+
+        response = self.client.get(self.endpoint)
+        etag = response.headers['ETag']
+        response = self.client.get(self.endpoint, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        self._post(self.endpoint, {'content': 'another message'})
+        response = self.client.get(self.endpoint, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(json.loads(response.data).get('messages')), 2)
+
+    def test_get_message_fields(self):
+        """
+        Get a message with only some of its fields
+        """
+        code, response = self._post(self.endpoint, {'content': 'racecar'})
+        id = response.get('message').get('id')
+        url = '{}/{}'.format(self.endpoint, id)
+
+        code, response = self._get(url + '?fields=content,palindrome')
+        self.assertEqual(code, HTTPStatus.OK)
+        self.assertEqual(response.get('message'), {'content': 'racecar', 'palindrome': True})
+
+        # a sparse representation has its own validator
+        etag = self.client.get(url).headers['ETag']
+        response = self.client.get(url + '?fields=content', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        code, response = self._get(url + '?fields=content,secret')
+        self.assertEqual(code, HTTPStatus.BAD_REQUEST)
+
+    def test_get_messages_fields(self):
+        """
+        Walk the pages of messages with only some of their fields
+        """
+        for i in range(15):
+            self._post(self.endpoint, {'content': 'test message {}'.format(i)})
+
+        code, response = self._get(self.endpoint + '?limit=10&fields=id,content')
+        self.assertEqual(code, HTTPStatus.OK)
+        self.assertEqual(response.get('messages')[0], {'id': 1, 'content': 'test message 0'})
+
+        code, response = self._get(response.get('next_url'))
+        self.assertEqual([sorted(msg) for msg in response.get('messages')], [['content', 'id']] * 5)
+
+        code, response = self._get(self.endpoint + '?page=2&fields=content')
+        self.assertEqual(response.get('messages')[0], {'content': 'test message 10'})
+
+        code, response = self._get(self.endpoint + '?ids=2,99&fields=palindrome')
+        self.assertEqual(response.get('messages'), [{'palindrome': False}])
+        self.assertEqual(response.get('missing'), [99])
+
+        response = self.client.get(self.endpoint + '/export?since_id=14&fields=id')
+        self.assertEqual(response.data.decode().splitlines(), ['{"id":15}'])
+
+        code, response = self._get(self.endpoint + '?fields=')
+        self.assertEqual(code, HTTPStatus.BAD_REQUEST)
+
     def test_get_messages_success(self):
         """
          Create 20 messages and get them all using '/messages [GET]' endpoint
@@ -140,6 +292,213 @@ class APITestCase(TestCase):
         self.assertEqual(code, HTTPStatus.OK)
         self.assertTrue(len(response.get('messages')) == 0)
 
+    def test_get_messages_cursor_success(self):
+        """
+         Create 25 messages and walk them using the keyset cursor
+        """
+        for i in range(25):
+            data = {'content': 'test message {}'.format(i)}
+            code, response = self._post(self.endpoint, data)
+            self.assertEqual(code, HTTPStatus.CREATED)
+
+        ids = []
+        url = self.endpoint + '?limit=10'
+        while url:
+            code, response = self._get(url)
+            self.assertEqual(code, HTTPStatus.OK)
+            self.assertTrue(len(response.get('messages')) <= 10)
+            ids.extend(msg.get('id') for msg in response.get('messages'))
+            url = response.get('next_url')
+            if url:
+                self.assertTrue(response.get('next_cursor'))
+
+        self.assertEqual(ids, list(range(1, 26)))
+
+    def test_get_messages_cursor_limit_capped(self):
+        """
+         Request more messages than the maximum page size
+        """
+        for i in range(3):
+            self._post(self.endpoint, {'content': 'test message {}'.format(i)})
+
+        self.app.config['MESSAGES_MAX_PER_PAGE'] = 2
+        code, response = self._get(self.endpoint + '?limit=50')
+        self.assertEqual(code, HTTPStatus.OK)
+        self.assertEqual(len(response.get('messages')), 2)
+        self.assertTrue(response.get('next_cursor'))
+
+    def test_get_messages_cursor_fail(self):
+        """
+         Attempt to get messages with an invalid cursor or limit
+        """
+        code, response = self._get(self.endpoint + '?cursor=not-a-cursor')
+        self.assertEqual(code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(response.get('error'), 'Invalid cursor.')
+
+        code, response = self._get(self.endpoint + '?limit=0')
+        self.assertEqual(code, HTTPStatus.BAD_REQUEST)
+
+    def test_get_messages_palindrome_filter(self):
+        """
+         Create palindromes and non palindromes and filter on the stored flag
+        """
+        for content in ['aba', 'abc', 'Abba', 'test message']:
+            code, response = self._post(self.endpoint, {'content': content})
+            self.assertEqual(code, HTTPStatus.CREATED)
+
+        code, response = self._get(self.endpoint + '?palindrome=true')
+        self.assertEqual(code, HTTPStatus.OK)
+        self.assertEqual(
+            [msg.get('content') for msg in response.get('messages')], ['aba', 'Abba'])
+
+        code, response = self._get(self.endpoint + '?page=1&palindrome=false')
+        self.assertEqual(code, HTTPStatus.OK)
+        self.assertEqual(
+            [msg.get('content') for msg in response.get('messages')], ['abc', 'test message'])
+
+        code, response = self._get(self.endpoint + '?palindrome=maybe')
+        self.assertEqual(code, HTTPStatus.BAD_REQUEST)
+
+    def test_search_messages(self):
+        """
+         Search the messages through the full-text index, best matches first
+        """
+        for content in ['red apple', 'green apple', 'apple apple pie', 'banana', 'red car']:
+            code, response = self._post(self.endpoint, {'content': content})
+            self.assertEqual(code, HTTPStatus.CREATED)
+
+        code, response = self._get(self.endpoint + '?q=apple')
+        self.assertEqual(code, HTTPStatus.OK)
+        contents = [msg.get('content') for msg in response.get('messages')]
+        self.assertEqual(contents[0], 'apple apple pie')
+        self.assertEqual(sorted(contents), ['apple apple pie', 'green apple', 'red apple'])
+
+        code, response = self._get(self.endpoint + '?q=red%20apple')
+        self.assertEqual(
+            [msg.get('content') for msg in response.get('messages')], ['red apple'])
+
+        # updates and deletes are reflected in the index
+        self._put(self.endpoint, 4, {'content': 'banana split'})
+        self._delete(self.endpoint, 5)
+        code, response = self._get(self.endpoint + '?q=split')
+        self.assertEqual([msg.get('id') for msg in response.get('messages')], [4])
+        code, response = self._get(self.endpoint + '?q=car')
+        self.assertEqual(response.get('messages'), [])
+
+    def test_search_messages_pagination(self):
+        """
+         Walk the search results using the offset cursor
+        """
+        for i in range(7):
+            self._post(self.endpoint, {'content': 'needle {}'.format(i)})
+        self._post(self.endpoint, {'content': 'haystack'})
+
+        ids = []
+        url = self.endpoint + '?q=needle&limit=3'
+        while url:
+            code, response = self._get(url)
+            self.assertEqual(code, HTTPStatus.OK)
+            ids.extend(msg.get('id') for msg in response.get('messages'))
+            url = response.get('next_url')
+        self.assertEqual(sorted(ids), list(range(1, 8)))
+
+    def test_search_messages_fail(self):
+        """
+         Attempt to search with a query without words or with an invalid cursor
+        """
+        code, response = self._get(self.endpoint + '?q=%22*%20-')
+        self.assertEqual(code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(response.get('error'), 'Search query must contain at least one word.')
+
+        code, response = self._get(self.endpoint + '?q=apple&cursor=not-a-cursor')
+        self.assertEqual(code, HTTPStatus.BAD_REQUEST)
+
+    def test_get_messages_by_ids(self):
+        """
+         Fetch many messages by id, in request order, with the missing ids reported
+        """
+        for i in range(3):
+            self._post(self.endpoint, {'content': 'test message {}'.format(i)})
+
+        code, response = self._get(self.endpoint + '?ids=3,12,1,3')
+        self.assertEqual(code, HTTPStatus.OK)
+        self.assertEqual([msg.get('id') for msg in response.get('messages')], [3, 1])
+        self.assertEqual(response.get('missing'), [12])
+
+        code, response = self._post(self.endpoint + '/lookup', {'ids': [2, 13]})
+        self.assertEqual(code, HTTPStatus.OK)
+        self.assertEqual([msg.get('id') for msg in response.get('messages')], [2])
+        self.assertEqual(response.get('missing'), [13])
+
+        code, response = self._get(self.endpoint + '?ids=1,a')
+        self.assertEqual(code, HTTPStatus.BAD_REQUEST)
+
+        code, response = self._post(self.endpoint + '/lookup', {'ids': 'a'})
+        self.assertEqual(code, HTTPStatus.BAD_REQUEST)
+
+    def test_export_messages(self):
+        """
+         Export all the messages as NDJSON, then only the ones after an id
+        """
+        for i in range(5):
+            self._post(self.endpoint, {'content': 'test message {}'.format(i)})
+
+        response = self.client.get(self.endpoint + '/export')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = response.data.decode().splitlines()
+        self.assertEqual([json.loads(line).get('id') for line in lines], [1, 2, 3, 4, 5])
+
+        response = self.client.get(self.endpoint + '/export?since_id=3')
+        lines = response.data.decode().splitlines()
+        self.assertEqual([json.loads(line).get('id') for line in lines], [4, 5])
+
+        response = self.client.get(
+            self.endpoint + '/export?since_modified=2000-01-01T00:00:00%2B00:00')
+        self.assertEqual(len(response.data.decode().splitlines()), 5)
+
+        response = self.client.get(self.endpoint + '/export?since_modified=yesterday')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_import_messages_ndjson(self):
+        """
+         Import NDJSON rows, the invalid ones are rejected without aborting the load
+        """
+        self.app.config['MESSAGES_IMPORT_CHUNK_SIZE'] = 2
+        body = '\n'.join([
+            json.dumps({'content': 'aba'}),
+            json.dumps({'content': ' '}),
+            'not json',
+            '',
+            json.dumps({'content': 'test message'}),
+            json.dumps({'content': 'last'}),
+        ])
+        response = self.client.post(
+            self.endpoint + '/import', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        result = json.loads(response.data)
+        self.assertEqual(result.get('imported'), 3)
+        self.assertEqual(result.get('rejected'), 2)
+        self.assertEqual([error.get('line') for error in result.get('errors')], [2, 3])
+
+        code, response = self._get(self.endpoint + '?page=1')
+        msgs = response.get('messages')
+        self.assertEqual([msg.get('content') for msg in msgs], ['aba', 'test message', 'last'])
+        self.assertEqual(msgs[0].get('palindrome'), True)
+
+    def test_import_messages_csv(self):
+        """
+         Import CSV rows with a content column
+        """
+        body = 'content\n"hello, world"\nabba\n""\n'
+        response = self.client.post(
+            self.endpoint + '/import', data=body, content_type='text/csv')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        result = json.loads(response.data)
+        self.assertEqual(result.get('imported'), 2)
+        self.assertEqual(result.get('rejected'), 1)
+        self.assertEqual(result.get('errors')[0].get('line'), 4)
+
     # delete
     def test_delete_message_fail(self):
         """
@@ -197,6 +556,35 @@ class APITestCase(TestCase):
         msg = response.get('message')
         self.assertEqual(msg.get('id'), id)
         self.assertEqual(msg.get('content'), data.get('content'))
+        self.assertEqual(msg.get('palindrome'), False)
+
+        # update the message to a palindrome
+        data = {'content': 'racecar'}
+        code, response = self._put(self.endpoint, id, data)
+        self.assertEqual(code, HTTPStatus.OK)
+        self.assertEqual(response.get('message').get('palindrome'), True)
+
+    def test_message_longest_palindrome(self):
+        """
+        Create and update a message, its longest palindrome follows its content
+        """
+        code, response = self._post(self.endpoint, {'content': 'xyz Level abc'})
+        self.assertEqual(code, HTTPStatus.CREATED)
+        id = response.get('message').get('id')
+
+        code, response = self._get(self.endpoint, id)
+        msg = response.get('message')
+        self.assertEqual(msg.get('longest_palindrome'), ' Level ')
+        self.assertEqual(msg.get('longest_palindrome_start'), 3)
+        self.assertEqual(msg.get('longest_palindrome_end'), 10)
+
+        code, response = self._put(self.endpoint, id, {'content': 'abba'})
+        self.assertEqual(code, HTTPStatus.OK)
+        code, response = self._get(self.endpoint, id)
+        msg = response.get('message')
+        self.assertEqual(msg.get('longest_palindrome'), 'abba')
+        self.assertEqual(msg.get('longest_palindrome_start'), 0)
+        self.assertEqual(msg.get('longest_palindrome_end'), 4)
 
     # utility methods
     def _post(self, endpoint=None, data=None):
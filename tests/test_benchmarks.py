@@ -0,0 +1,65 @@
+import os
+import json
+import tempfile
+from unittest import TestCase
+
+from benchmarks import load, micro, serving
+from benchmarks.stats import percentile, summarize
+
+
+class StatsTestCase(TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.50), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([7], 0.99), 7)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_summarize(self):
+        result = summarize([0.001, 0.002, 0.003, 0.004], elapsed=0.5, errors=1)
+        self.assertEqual(result['requests'], 4)
+        self.assertEqual(result['errors'], 1)
+        self.assertEqual(result['throughput'], 8.0)
+        self.assertEqual(result['p50'], 2.0)
+        self.assertEqual(result['p99'], 4.0)
+
+
+class BenchmarkSmokeTestCase(TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+    def test_load(self):
+        fd, database = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.addCleanup(os.remove, database)
+
+        results = load.main(['--database-uri', 'sqlite:///' + database, '--requests', '5',
+                             '--messages', '30', '--concurrency', '2', '--output', self.path])
+        self.assertEqual(set(results), {'create', 'get', 'list_shallow', 'list_deep',
+                                        'list_cursor_deep', 'update', 'delete', 'swagger'})
+        for result in results.values():
+            self.assertEqual(result['requests'], 5)
+            self.assertEqual(result['errors'], 0)
+
+        with open(self.path) as f:
+            saved = json.load(f)
+        self.assertEqual(saved['meta']['concurrency'], 2)
+        self.assertEqual(saved['meta']['enrichment'], 'thread')
+        self.assertEqual(saved['results'], results)
+
+    def test_micro(self):
+        results = micro.main(['--repeat', '2', '--number', '2', '--only', 'schema_dump',
+                              'is_palindrome_short'])
+        self.assertEqual(set(results), {'schema_dump', 'is_palindrome_short'})
+
+    def test_serving(self):
+        results = serving.main(['--modes', 'sync', '--workers', '1', '--requests', '5',
+                                '--messages', '10', '--concurrency', '2', '--only', 'get',
+                                '--output', self.path])
+        self.assertEqual(set(results), {'sync/get'})
+        self.assertEqual(results['sync/get']['errors'], 0)
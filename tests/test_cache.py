@@ -0,0 +1,268 @@
+import os
+import json
+import tempfile
+from http import HTTPStatus
+from unittest import TestCase
+
+from app import db, cache, create_app
+from app.cache import LocalBackend, KeyValueBackend
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeKeyValueStore:
+    """Local stand-in for redis, counts the round trips"""
+
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    def get(self, key):
+        self.round_trips += 1
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.round_trips += 1
+        self.data[key] = value.encode()
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+
+    def __init__(self, store):
+        self.store = store
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((name, args))
+
+    def execute(self):
+        self.store.round_trips += 1
+        data = self.store.data
+        results = []
+        for name, args in self.commands:
+            key = args[0]
+            if name == 'get':
+                results.append(data.get(key))
+            elif name == 'incr':
+                data[key] = str(int(data.get(key, 0)) + 1).encode()
+                results.append(int(data[key]))
+            elif name == 'delete':
+                results.append(int(data.pop(key, None) is not None))
+            else:
+                results.append(True)
+        return results
+
+
+class LocalBackendTestCase(TestCase):
+
+    def test_lru_eviction(self):
+        backend = LocalBackend(max_size=2, ttl=60)
+        backend.set(1, 'a')
+        backend.set(2, 'b')
+        backend.get(1)
+        backend.set(3, 'c')
+        self.assertEqual(backend.get(1), 'a')
+        self.assertIsNone(backend.get(2))
+        self.assertEqual(backend.get(3), 'c')
+        self.assertEqual(len(backend), 2)
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        backend = LocalBackend(max_size=2, ttl=10, clock=clock)
+        backend.set(1, 'a')
+        clock.now = 9
+        self.assertEqual(backend.get(1), 'a')
+        clock.now = 10
+        self.assertIsNone(backend.get(1))
+        self.assertEqual(len(backend), 0)
+
+    def test_set_after_delete_is_dropped(self):
+        backend = LocalBackend(max_size=2, ttl=60)
+        _, version = backend.lookup(1)
+        backend.delete(1)
+        backend.set(1, 'stale', version)
+        self.assertIsNone(backend.get(1))
+        backend.set(1, 'a', backend.lookup(1)[1])
+        self.assertEqual(backend.get(1), 'a')
+
+
+class KeyValueBackendTestCase(TestCase):
+
+    def test_set_after_delete_in_another_process_is_dropped(self):
+        """
+        A value loaded by one process while another one deletes the key is
+        never served
+        """
+        store = FakeKeyValueStore()
+        reader, writer = KeyValueBackend(store), KeyValueBackend(store)
+        reader.set(1, 'a')
+        self.assertEqual(writer.get(1), 'a')
+
+        _, version = reader.lookup(1)
+        writer.delete(1)
+        reader.set(1, 'stale', version)
+        self.assertIsNone(reader.get(1))
+        self.assertIsNone(writer.get(1))
+
+        reader.set(1, 'b', reader.lookup(1)[1])
+        self.assertEqual(writer.get(1), 'b')
+
+    def test_round_trips(self):
+        """
+        A lookup, a set and a delete are one round trip each
+        """
+        store = FakeKeyValueStore()
+        backend = KeyValueBackend(store)
+        value, version = backend.lookup(1)
+        backend.set(1, 'a', version)
+        self.assertEqual(backend.lookup(1), ('a', 0))
+        backend.delete(1)
+        self.assertEqual(backend.lookup(1), (None, 1))
+        self.assertEqual(store.round_trips, 5)
+
+
+class MessageCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.app = create_app('TEST')
+        self.store = FakeKeyValueStore()
+        self.app.config['MESSAGE_CACHE_BACKEND'] = KeyValueBackend(self.store)
+        cache.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        db.create_all()
+        self.endpoint = '/api/v1/messages'
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_read_through(self):
+        """
+        Read a message twice, the second read is served by the cache
+        """
+        response = self.client.post(self.endpoint, json={'content': 'aba'})
+        id = response.get_json().get('message').get('id')
+
+        first = self.client.get('{}/{}'.format(self.endpoint, id))
+        second = self.client.get('{}/{}'.format(self.endpoint, id))
+        self.assertEqual(first.get_json(), second.get_json())
+        version, (payload, etag, _) = json.loads(self.store.data['messages:{}'.format(id)])
+        self.assertEqual(version, KeyValueBackend(self.store).lookup(id)[1])
+        self.assertEqual(json.loads(payload), first.get_json().get('message'))
+        self.assertEqual(first.headers['ETag'], '"{}"'.format(etag))
+
+        stats = self.client.get('/api/v1/cache/stats').get_json()
+        self.assertEqual(stats.get('hits'), 1)
+        self.assertEqual(stats.get('misses'), 1)
+
+    def test_invalidate_on_update_and_delete(self):
+        """
+        Update and delete a cached message, readers never see the old content
+        """
+        response = self.client.post(self.endpoint, json={'content': 'aba'})
+        url = '{}/{}'.format(self.endpoint, response.get_json().get('message').get('id'))
+        self.client.get(url)
+
+        self.client.put(url, json={'content': 'updated'})
+        response = self.client.get(url)
+        self.assertEqual(response.get_json().get('message').get('content'), 'updated')
+
+        self.client.delete(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(list(self.store.data), ['messages:version:{}'.format(
+            url.rsplit('/', 1)[1])])
+
+    def test_stale_load_across_processes(self):
+        """
+        A worker that read a message before another worker updated it does
+        not cache the old content
+        """
+        from app.api.messages import _load_message
+
+        path = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+        self.addCleanup(os.remove, path)
+        workers = []
+        for _ in range(2):
+            app = create_app('TEST')
+            app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+            app.config['MESSAGE_CACHE_BACKEND'] = KeyValueBackend(self.store)
+            cache.init_app(app)
+            workers.append(app)
+        reader, writer = workers
+        with writer.app_context():
+            db.create_all()
+            response = writer.test_client().post(self.endpoint, json={'content': 'aba'})
+        id = response.get_json().get('message').get('id')
+        url = '{}/{}'.format(self.endpoint, id)
+
+        def load_then_update():
+            entry = _load_message(id)
+            # the writer commits and invalidates before the reader stores
+            writer.test_client().put(url, json={'content': 'updated'})
+            return entry
+
+        with reader.app_context():
+            entry = cache.get_or_load(id, load_then_update)
+        self.assertIn('"aba"', entry[0])
+
+        for app in workers:
+            response = app.test_client().get(url)
+            self.assertEqual(response.get_json().get('message').get('content'), 'updated')
+
+
+class WorkersTestCase(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+        self.addCleanup(os.remove, self.path)
+        self.endpoint = '/api/v1/messages'
+
+    def _workers(self, count, **config):
+        """`count` app instances on one database, like the gunicorn workers"""
+        workers = []
+        for _ in range(count):
+            app = create_app('TEST')
+            app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///' + self.path,
+                              SERVER_WORKERS=count, **config)
+            cache.init_app(app)
+            with app.app_context():
+                db.create_all()
+                self.addCleanup(db.engine.dispose)
+            workers.append(app)
+        return workers
+
+    def test_local_cache_with_workers(self):
+        """
+        An update through one worker is seen by the others with the default
+        local cache
+        """
+        reader, writer = self._workers(2)
+        with reader.app_context():
+            self.assertFalse(cache.enabled)
+
+        response = writer.test_client().post(self.endpoint, json={'content': 'aba'})
+        url = '{}/{}'.format(self.endpoint, response.get_json().get('message').get('id'))
+        self.assertEqual(reader.test_client().get(url).get_json().get('message').get('content'),
+                         'aba')
+        writer.test_client().put(url, json={'content': 'updated'})
+        self.assertEqual(reader.test_client().get(url).get_json().get('message').get('content'),
+                         'updated')
+
+    def test_local_cache_with_one_worker(self):
+        app, = self._workers(1)
+        with app.app_context():
+            self.assertTrue(cache.enabled)
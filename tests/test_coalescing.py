@@ -0,0 +1,94 @@
+import threading
+import time
+from unittest import TestCase
+from prometheus_client import REGISTRY
+
+from app import db, create_app, coalescer
+from tests import test_api
+
+
+class CoalescedAPITestCase(test_api.APITestCase):
+    """Runs the API test suite with the write coalescing"""
+
+    def setUp(self):
+        super().setUp()
+        self.app.config['WRITE_COALESCING'] = True
+
+
+class WriteCoalescerTestCase(TestCase):
+
+    def setUp(self):
+        self.app = create_app('TEST')
+        self.app.config['WRITE_COALESCING'] = True
+        self.app.config['WRITE_COALESCING_MAX_BATCH'] = 4
+        self.app.config['WRITE_COALESCING_MAX_WAIT_MS'] = 200
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _concurrently(self, writes):
+        results = [None] * len(writes)
+
+        def run(i, write):
+            with self.app.app_context():
+                try:
+                    results[i] = write()
+                except Exception as e:
+                    results[i] = e
+
+        threads = [threading.Thread(target=run, args=(i, write)) for i, write in enumerate(writes)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_batch(self):
+        """
+        Concurrent writes share a transaction and each gets its own row
+        """
+        first = coalescer.create('abba')
+        batches = REGISTRY.get_sample_value('write_coalescing_batch_size_count')
+        results = self._concurrently([
+            lambda: coalescer.create('one'),
+            lambda: coalescer.create('racecar'),
+            lambda: coalescer.update(first.id, 'two'),
+            lambda: coalescer.update(first.id + 100, 'three'),
+        ])
+
+        created = results[:2]
+        self.assertEqual(sorted(row.content for row in created), ['one', 'racecar'])
+        self.assertEqual(len({row.id for row in created} | {first.id}), 3)
+        self.assertTrue(all(row.palindrome == (row.content == 'racecar') for row in created))
+        self.assertEqual((results[2].id, results[2].content, results[2].palindrome),
+                         (first.id, 'two', False))
+        self.assertIsNone(results[3])
+        self.assertEqual(REGISTRY.get_sample_value('write_coalescing_batch_size_count') - batches, 1)
+
+    def test_failing_write(self):
+        """
+        A failing write does not fail the others of its batch
+        """
+        results = self._concurrently([
+            lambda: coalescer.create('one'),
+            lambda: coalescer.create(None),
+            lambda: coalescer.create('two'),
+        ])
+
+        self.assertIsInstance(results[1], Exception)
+        self.assertEqual(sorted(row.content for row in (results[0], results[2])), ['one', 'two'])
+
+    def test_single_threaded(self):
+        """
+        A process that handles one request at a time does not wait for
+        other writes
+        """
+        self.app.config['SERVER_THREADS'] = 1
+        started = time.perf_counter()
+        self.assertEqual(coalescer.create('abba').content, 'abba')
+        self.assertLess(time.perf_counter() - started, 0.1)
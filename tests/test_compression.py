@@ -0,0 +1,86 @@
+import gzip
+import json
+from unittest import TestCase
+
+from app import db, create_app
+
+
+class CompressionTestCase(TestCase):
+
+    def setUp(self):
+        self.app = create_app('TEST')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        db.create_all()
+        self.endpoint = '/api/v1/messages'
+        for i in range(20):
+            self.client.post(self.endpoint, data=json.dumps({'content': 'message {}'.format(i)}),
+                             content_type='application/json')
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_gzip(self):
+        """
+        A page is gzipped for the clients that accept it, with its own ETag
+        """
+        identity = self.client.get(self.endpoint + '?limit=20')
+        response = self.client.get(self.endpoint + '?limit=20', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertLess(len(response.data), len(identity.data))
+        self.assertEqual(gzip.decompress(response.data), identity.data)
+
+        etag = response.headers['ETag']
+        self.assertEqual(etag, identity.headers['ETag'][:-1] + '-gzip"')
+        response = self.client.get(self.endpoint + '?limit=20', headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+
+    def test_not_compressed(self):
+        """
+        Small responses and the clients that do not accept gzip get identity
+        """
+        response = self.client.get(self.endpoint + '/1', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+        for accept in ('identity', 'gzip;q=0, br;q=0', 'deflate'):
+            response = self.client.get(self.endpoint + '?limit=20', headers={'Accept-Encoding': accept})
+            self.assertNotIn('Content-Encoding', response.headers)
+
+        self.app.config['COMPRESSION_MIN_SIZE'] = 10 ** 6
+        response = self.client.get(self.endpoint + '?limit=20', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_streamed(self):
+        """
+        The export is compressed as it is streamed
+        """
+        identity = self.client.get(self.endpoint + '/export')
+        response = self.client.get(self.endpoint + '/export', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+        self.assertEqual(gzip.decompress(response.data), identity.data)
+
+    def test_openapi_precompressed(self):
+        """
+        The OpenAPI document is compressed once
+        """
+        headers = {'Accept-Encoding': 'gzip'}
+        first = self.client.get('/api/v1/swagger.json', headers=headers)
+        self.assertEqual(first.headers['Content-Encoding'], 'gzip')
+        self.assertTrue(json.loads(gzip.decompress(first.data)).get('paths'))
+        self.assertEqual(len(self.app.extensions['compression'].static), 1)
+
+        second = self.client.get('/api/v1/swagger.json', headers=headers)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(len(self.app.extensions['compression'].static), 1)
+
+        response = self.client.get('/api/v1/swagger.json', headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
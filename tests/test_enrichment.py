@@ -0,0 +1,148 @@
+from datetime import datetime
+import threading
+from unittest import TestCase, mock
+
+from werkzeug.http import parse_date
+
+from app import db, create_app, enricher
+from app.config import TestConfig
+from app.models import Message
+
+
+class ThreadConfig(TestConfig):
+    ENRICHMENT_MODE = 'thread'
+
+
+class OffConfig(TestConfig):
+    ENRICHMENT_MODE = 'off'
+
+
+class _EnricherTestCase(TestCase):
+
+    config = None
+
+    def setUp(self):
+        self.app = create_app('TEST')
+        self.app.config.from_object(self.config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _message(self, id):
+        db.session.expire_all()
+        return Message.query.get(id)
+
+
+class EnrichmentTestCase(_EnricherTestCase):
+
+    config = ThreadConfig
+    def test_thread(self):
+        """
+        The worker thread writes the longest palindrome of the messages
+        """
+        msg = Message(content='noon at racecar')
+        msg.add_or_update()
+        enricher.join()
+
+        msg = self._message(msg.id)
+        self.assertEqual(msg.longest_palindrome, 'racecar')
+        self.assertEqual((msg.longest_palindrome_start, msg.longest_palindrome_end), (8, 15))
+
+    def test_drain(self):
+        """
+        The queued messages are written before the process exits, or given
+        up on after the timeout
+        """
+        release = threading.Event()
+        write = enricher.write
+        with mock.patch.object(enricher, 'write',
+                               side_effect=lambda messages: release.wait() and write(messages)):
+            msg = Message(content='abba')
+            msg.add_or_update()
+            self.assertFalse(enricher.drain(0.05))
+            release.set()
+            self.assertTrue(enricher.drain(5))
+        self.assertEqual(self._message(msg.id).longest_palindrome, 'abba')
+
+    def test_drain_at_exit(self):
+        """
+        The worker thread registers the drain of its process at exit
+        """
+        with mock.patch('atexit.register') as register:
+            Message(content='abba').add_or_update()
+            enricher.join()
+        self.assertEqual(len(register.call_args_list), 1)
+        with mock.patch.object(enricher, '_drain') as drain:
+            exit, state, pid = register.call_args[0]
+            exit(state, pid)
+            exit(state, pid + 1)
+        drain.assert_called_once_with(state, self.app.config['ENRICHMENT_DRAIN_TIMEOUT'])
+
+    def test_stale_content(self):
+        """
+        The values computed from a replaced content are not written
+        """
+        msg = Message(content='abba')
+        msg.add_or_update()
+        enricher.join()
+        msg = self._message(msg.id)
+        msg.content = 'xyz'
+        msg.reset_enrichment()
+        db.session.commit()
+
+        enricher.write([(msg.id, 'abba')])
+        self.assertIsNone(self._message(msg.id).longest_palindrome)
+
+
+class BackfillTestCase(_EnricherTestCase):
+
+    config = OffConfig
+
+    def test_backfill(self):
+        """
+        `flask messages enrich` enriches the messages that are not yet
+        """
+        ids = []
+        for content in ['aa', 'abcba', 'xyz']:
+            msg = Message(content=content)
+            msg.add_or_update()
+            ids.append(msg.id)
+        self.assertIsNone(self._message(ids[0]).longest_palindrome)
+
+        result = self.app.test_cli_runner().invoke(args=['messages', 'enrich', '--batch-size', '2'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('3 enriched', result.output)
+        self.assertEqual([self._message(id).longest_palindrome for id in ids], ['aa', 'abcba', 'x'])
+
+        result = self.app.test_cli_runner().invoke(args=['messages', 'enrich'])
+        self.assertIn('0 enriched', result.output)
+
+    def test_last_modified(self):
+        """
+        A message gets a Last-Modified date once it is enriched, later
+        than the one of its content
+        """
+        client = self.app.test_client()
+        response = client.post('/api/v1/messages', json={'content': 'level'})
+        id = response.get_json().get('message').get('id')
+        url = '/api/v1/messages/{}'.format(id)
+        # written long ago
+        db.session.execute(Message.__table__.update().values(date_modified=datetime(2000, 1, 1)))
+        db.session.commit()
+
+        response = client.get(url)
+        self.assertIsNone(response.get_json().get('message').get('longest_palindrome'))
+        self.assertNotIn('Last-Modified', response.headers)
+        response = client.get(url + '?fields=content')
+        self.assertEqual(response.headers['Last-Modified'], 'Sat, 01 Jan 2000 00:00:00 GMT')
+
+        enricher.backfill(10)
+        response = client.get(url)
+        self.assertEqual(response.get_json().get('message').get('longest_palindrome'), 'level')
+        self.assertGreater(parse_date(response.headers['Last-Modified']),
+                           datetime(2000, 1, 1))
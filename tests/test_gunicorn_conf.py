@@ -0,0 +1,87 @@
+import os
+import runpy
+import tempfile
+from unittest import TestCase, mock
+
+from app import create_app, db
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_conf(**environ):
+    with mock.patch.dict(os.environ, environ):
+        return runpy.run_path(os.path.join(ROOT, 'gunicorn.conf.py'))
+
+
+class GunicornConfTestCase(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.conf = load_conf()
+
+    def _write(self, path, content):
+        path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def test_cgroup_v2(self):
+        self._write('cpu.max', '150000 100000\n')
+        self.assertEqual(self.conf['cgroup_cpus'](self.root), 1.5)
+        self._write('cpu.max', 'max 100000\n')
+        self.assertIsNone(self.conf['cgroup_cpus'](self.root))
+
+    def test_cgroup_v1(self):
+        self._write('cpu,cpuacct/cpu.cfs_quota_us', '50000\n')
+        self._write('cpu,cpuacct/cpu.cfs_period_us', '100000\n')
+        self.assertEqual(self.conf['cgroup_cpus'](self.root), 0.5)
+        self._write('cpu,cpuacct/cpu.cfs_quota_us', '-1\n')
+        self.assertIsNone(self.conf['cgroup_cpus'](self.root))
+
+    def test_available_cpus(self):
+        """
+        The cgroup quota caps the CPUs, rounded up to at least one
+        """
+        self._write('cpu.max', '50000 100000\n')
+        self.assertEqual(self.conf['available_cpus'](self.root), 1)
+        self._write('cpu.max', '100000000 100000\n')
+        self.assertEqual(self.conf['available_cpus'](self.root), len(os.sched_getaffinity(0)))
+        self.assertEqual(self.conf['default_workers']('sync', 2), 5)
+        self.assertEqual(self.conf['default_workers']('gthread', 2), 3)
+
+    def test_settings(self):
+        conf = load_conf(GUNICORN_WORKER_CLASS='gthread', GUNICORN_WORKERS='3',
+                         GUNICORN_PRELOAD='false', GUNICORN_MAX_REQUESTS='10')
+        self.assertEqual((conf['worker_class'], conf['threads'], conf['workers']), ('gthread', 4, 3))
+        self.assertFalse(conf['preload_app'])
+        self.assertEqual(conf['max_requests'], 10)
+        self.assertEqual(load_conf(SERVING_MODE='asgi')['worker_class'],
+                         'uvicorn.workers.UvicornWorker')
+        self.assertTrue(self.conf['preload_app'])
+        self.assertEqual((self.conf['worker_class'], self.conf['threads']), ('gthread', 4))
+
+    def test_server_threads(self):
+        """
+        The threads of the workers are passed on to the app
+        """
+        for worker_class, threads in [('sync', '1'), ('gthread', '4')]:
+            with mock.patch.dict(os.environ, GUNICORN_WORKER_CLASS=worker_class):
+                runpy.run_path(os.path.join(ROOT, 'gunicorn.conf.py'))
+                self.assertEqual(os.environ['SERVER_THREADS'], threads)
+
+    def test_post_fork(self):
+        """
+        A worker of a preloaded app starts from empty connection pools
+        """
+        app = create_app('TEST')
+        with app.app_context():
+            pool = db.get_engine().pool
+        server = mock.Mock()
+        server.cfg.preload_app = True
+        server.app.wsgi.return_value = app
+
+        self.conf['post_fork'](server, mock.Mock())
+        with app.app_context():
+            self.assertIsNot(db.get_engine().pool, pool)
+            self.assertIsInstance(db.get_engine().pool, type(pool))
@@ -2,6 +2,8 @@ from http import HTTPStatus
 from unittest import TestCase
 from datetime import datetime
 
+from sqlalchemy import event
+
 from app import db, create_app
 from app.models import Message, MessageResponseSchema
 
@@ -65,6 +67,46 @@ class MessageModelTestCase(TestCase):
         m = Message.find_by_id(m.id)
         self.assertIsNone(m)
 
+    def _statements(self, call):
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement.split()[0])
+        engine = db.get_engine()
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            result = call()
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+        return result, statements
+
+    def test_update_by_id(self):
+        self.app.config['ENRICHMENT_MODE'] = 'off'
+        m = Message(content='test')
+        m.add_or_update()
+        m.longest_palindrome = 't'
+        db.session.commit()
+        id = m.id
+
+        row, statements = self._statements(lambda: Message.update_by_id(id, 'level'))
+        # no SELECT before the UPDATE, the row is read back in its transaction
+        self.assertEqual(statements, ['UPDATE', 'SELECT'])
+        self.assertEqual((row.id, row.content, row.palindrome), (id, 'level', True))
+        self.assertIsNone(row.longest_palindrome)
+
+        row, statements = self._statements(lambda: Message.update_by_id(id + 1, 'level'))
+        self.assertIsNone(row)
+        self.assertEqual(statements, ['UPDATE'])
+
+    def test_delete_by_id(self):
+        m = Message(content='test')
+        m.add_or_update()
+        id = m.id
+
+        deleted, statements = self._statements(lambda: Message.delete_by_id(id))
+        self.assertTrue(deleted)
+        self.assertEqual(statements, ['DELETE'])
+        self.assertIsNone(Message.find_by_id(id))
+        self.assertFalse(Message.delete_by_id(id))
+
     def test_to_json(self):
         m = Message()
         m.content = 'test'
@@ -72,7 +114,8 @@ class MessageModelTestCase(TestCase):
 
         schema = MessageResponseSchema()
         m_json = schema.dump(m)
-        expected_keys = ['id', 'content', 'palindrome', 'date_created', 'date_modified']
+        expected_keys = ['id', 'content', 'palindrome', 'date_created', 'date_modified',
+                         'longest_palindrome', 'longest_palindrome_start', 'longest_palindrome_end']
         self.assertEqual(sorted(m_json.keys()), sorted(expected_keys))
 
 
@@ -0,0 +1,59 @@
+from http import HTTPStatus
+from unittest import TestCase
+from prometheus_client import REGISTRY
+
+from app import db, create_app
+
+
+class MetricsTestCase(TestCase):
+
+    def setUp(self):
+        self.app = create_app('TEST')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        db.create_all()
+        self.endpoint = '/api/v1/messages'
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_metrics(self):
+        """
+        Requests are counted by route template and status along with their db statements
+        """
+        route = self.endpoint + '/<int:id>'
+        created = self.sample('http_requests_total', method='POST', route=self.endpoint, status='201')
+        not_found = self.sample('http_requests_total', method='GET', route=route, status='400')
+        queries = self.sample('db_queries_per_request_sum', method='POST', route=self.endpoint)
+        commits = self.sample('db_commit_duration_seconds_count')
+        sizes = self.sample('http_response_size_bytes_count', method='POST', route=self.endpoint)
+
+        response = self.client.post(self.endpoint, json={'content': 'aba'})
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.client.get(self.endpoint + '/1000')
+
+        self.assertEqual(self.sample('http_requests_total', method='POST', route=self.endpoint,
+                                     status='201'), created + 1)
+        self.assertEqual(self.sample('http_requests_total', method='GET', route=route,
+                                     status='400'), not_found + 1)
+        self.assertGreater(self.sample('db_queries_per_request_sum', method='POST',
+                                       route=self.endpoint), queries)
+        self.assertGreater(self.sample('db_commit_duration_seconds_count'), commits)
+        self.assertEqual(self.sample('http_response_size_bytes_count', method='POST',
+                                     route=self.endpoint), sizes + 1)
+
+    def test_metrics_endpoint(self):
+        self.client.post(self.endpoint, json={'content': 'aba'})
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        body = response.get_data(as_text=True)
+        self.assertIn('http_request_duration_seconds_bucket{', body)
+        self.assertIn('db_pool_checked_out{engine="primary"}', body)
+        self.assertNotIn('route="/metrics"', body)
@@ -0,0 +1,67 @@
+import os
+import json
+import tempfile
+from http import HTTPStatus
+from unittest import TestCase
+
+from app import create_app
+from app.config import config, TestConfig
+
+
+class NoDocsTestConfig(TestConfig):
+    API_DOCS = False
+
+
+class OpenAPITestCase(TestCase):
+
+    def setUp(self):
+        self.app = create_app('TEST')
+        self.client = self.app.test_client()
+        self.endpoint = '/api/v1/swagger.json'
+
+    def test_spec_built_once(self):
+        """
+        The document is built on the first request and then served as is with validators
+        """
+        self.assertNotIn('openapi', self.app.extensions)
+        response = self.client.get(self.endpoint)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        spec = response.get_json()
+        self.assertIn('/api/v1/messages', spec['paths'])
+        self.assertIn('MessageBatchUpdateSchema', spec['components']['schemas'])
+        self.assertIn('max-age=3600', response.headers['Cache-Control'])
+        etag = response.headers['ETag']
+
+        document = self.app.extensions['openapi']
+        response = self.client.get(self.endpoint)
+        self.assertIs(self.app.extensions['openapi'], document)
+        self.assertEqual(response.data, document[0])
+
+        response = self.client.get(self.endpoint, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_spec_file(self):
+        """
+        The document written by `flask openapi` is served when API_SPEC_FILE is set
+        """
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        result = self.app.test_cli_runner().invoke(args=['openapi', path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        with open(path) as f:
+            self.assertIn('/api/v1/messages', json.load(f)['paths'])
+
+        self.app.config['API_SPEC_FILE'] = path
+        response = self.client.get(self.endpoint)
+        with open(path, 'rb') as f:
+            self.assertEqual(response.data, f.read())
+
+    def test_docs_disabled(self):
+        config['TEST_NO_DOCS'] = NoDocsTestConfig
+        self.addCleanup(config.pop, 'TEST_NO_DOCS')
+        client = create_app('TEST_NO_DOCS').test_client()
+
+        self.assertEqual(client.get(self.endpoint).status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(client.get('/api/v1/docs/').status_code, HTTPStatus.NOT_FOUND)
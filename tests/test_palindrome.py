@@ -1,5 +1,12 @@
+import random
+import logging
+import threading
+from http import HTTPStatus
 from unittest import TestCase
+from app import create_app
 from app.models import is_palindrome
+from app import palindromes
+from app.palindromes import check, classify, longest_palindrome
 
 
 class WebserviceTestCase(TestCase): 
@@ -51,3 +58,121 @@ class WebserviceTestCase(TestCase):
     def test_palindrome_is_not_palindrome_5(self):
         res =  is_palindrome('(aba)')
         self.assertFalse(res)        
+
+
+class CheckTestCase(TestCase):
+
+    def test_strict_is_is_palindrome(self):
+        texts = ['', 'bb', 'Bb', 'aba', 'bba', ' aba', '()', '(aba)', 'İi', 'ßs', 'Éé', None, {},
+                 'ab' * 20 + 'a' + 'ba' * 20, 'ab' * 20 + 'c' + 'ab' * 20, 'ab' * 20 + ' ' + 'ba' * 20]
+        rng = random.Random(0)
+        texts += [''.join(rng.choice('aAb1 ,') for _ in range(rng.randint(0, 40)))
+                  for _ in range(2000)]
+        for text in texts:
+            self.assertEqual(check(text), is_palindrome(text), text)
+            self.assertEqual(check(text, 'strict'), is_palindrome(text), text)
+
+    def test_alnum(self):
+        self.assertTrue(check('A man, a plan, a canal: Panama', 'alnum'))
+        self.assertTrue(check('No "x" in Nixon', 'alnum'))
+        self.assertTrue(check('', 'alnum'))
+        self.assertTrue(check(' ,.', 'alnum'))
+        self.assertFalse(check('A man, a plan, a canal: Suez', 'alnum'))
+        self.assertFalse(check('Straße essartS', 'alnum'))
+
+    def test_casefold(self):
+        self.assertTrue(check('Straße essartS', 'casefold'))
+        # composed and decomposed forms of é
+        self.assertTrue(check('e\u0301t\u00e9', 'casefold'))
+        self.assertTrue(check('Was it a car or a cat I saw?', 'casefold'))
+        self.assertFalse(check('Straße', 'casefold'))
+
+    def test_classify_pool(self):
+        texts = ['aba', 'abc', 'A man, a plan, a canal: Panama'] * 10
+        expected = [check(text, 'alnum') for text in texts]
+        self.assertEqual(classify(texts, 'alnum', workers=2, threshold=1), expected)
+
+    def test_classify_pool_while_a_lock_is_held(self):
+        """
+        The pool does not fork the threads of the app with their locks: it
+        starts while another thread holds one
+        """
+        texts = ['aba', 'abc'] * 10
+        held, release = threading.Event(), threading.Event()
+
+        def hold():
+            with logging._lock:
+                held.set()
+                release.wait()
+
+        if palindromes._pool is not None:
+            palindromes._pool.shutdown()
+            palindromes._pool = None
+        holder = threading.Thread(target=hold)
+        holder.start()
+        held.wait()
+        results = []
+        try:
+            checker = threading.Thread(
+                target=lambda: results.append(classify(texts, workers=2, threshold=1)))
+            checker.start()
+            checker.join(60)
+            self.assertFalse(checker.is_alive())
+        finally:
+            release.set()
+            holder.join()
+        self.assertEqual(results, [[check(text) for text in texts]])
+        self.assertNotEqual(palindromes._pool._mp_context.get_start_method(), 'fork')
+
+
+class LongestPalindromeTestCase(TestCase):
+
+    @staticmethod
+    def _brute_force(text):
+        text = text.lower()
+        best = (0, 0)
+        for start in range(len(text)):
+            for end in range(start + 1, len(text) + 1):
+                if end - start > best[1] - best[0] and text[start:end] == text[start:end][::-1]:
+                    best = (start, end)
+        return best
+
+    def test_longest_palindrome(self):
+        self.assertEqual(longest_palindrome(''), (0, 0))
+        self.assertEqual(longest_palindrome('a'), (0, 1))
+        self.assertEqual(longest_palindrome('abc'), (0, 1))
+        self.assertEqual(longest_palindrome('xAbBay'), (1, 5))
+        self.assertEqual(longest_palindrome('abacdfgdcaba'), (0, 3))
+
+    def test_longest_palindrome_brute_force(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            text = ''.join(rng.choice('abAB ') for _ in range(rng.randint(0, 20)))
+            self.assertEqual(longest_palindrome(text), self._brute_force(text), text)
+
+
+class CheckEndpointTestCase(TestCase):
+
+    def setUp(self):
+        self.app = create_app('TEST')
+        self.client = self.app.test_client()
+        self.endpoint = '/api/v1/palindromes:check'
+
+    def test_check_palindromes(self):
+        texts = ['aba', 'A man, a plan, a canal: Panama', 'abc']
+        response = self.client.post(self.endpoint, json={'texts': texts})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.get_json(), {'mode': 'strict', 'results': [True, False, False]})
+
+        response = self.client.post(self.endpoint, json={'texts': texts, 'mode': 'alnum'})
+        self.assertEqual(response.get_json().get('results'), [True, True, False])
+
+    def test_check_palindromes_fail(self):
+        for data in [{'texts': 'aba'}, {'texts': ['aba', 1]}, {'texts': ['aba'], 'mode': 'loose'}, []]:
+            response = self.client.post(self.endpoint, json=data)
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST, data)
+
+        self.app.config['PALINDROMES_MAX_BATCH_SIZE'] = 2
+        response = self.client.post(self.endpoint, json={'texts': ['a', 'b', 'c']})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(response.get_json().get('error'), 'Cannot check more than 2 texts.')
@@ -0,0 +1,105 @@
+import json
+from http import HTTPStatus
+from unittest import TestCase
+
+from app import db, create_app
+from app.config import config, TestConfig
+from app.profiler import normalize
+
+
+class ProfilerTestConfig(TestConfig):
+    REQUEST_PROFILING = True
+    MESSAGE_CACHE_BACKEND = 'none'
+
+
+class SlowProfilerTestConfig(ProfilerTestConfig):
+    # everything is slow
+    PROFILER_SLOW_REQUEST_MS = 0
+    PROFILER_SLOW_QUERY_MS = 0
+
+
+def server_timing(response):
+    timings = {}
+    for timing in response.headers['Server-Timing'].split(', '):
+        name, _, params = timing.partition(';')
+        timings[name] = dict(param.split('=', 1) for param in params.split(';'))
+    return timings
+
+
+class NormalizeTestCase(TestCase):
+
+    def test_normalize(self):
+        self.assertEqual(
+            normalize('SELECT message.id \n FROM message WHERE message.id IN (?, ?, ?) LIMIT ?'),
+            'SELECT message.id FROM message WHERE message.id IN (...) LIMIT ?')
+        self.assertEqual(
+            normalize("SELECT * FROM message WHERE content = 'it''s' AND id > 42"),
+            'SELECT * FROM message WHERE content = ? AND id > ?')
+        self.assertEqual(
+            normalize('UPDATE message SET content=%(content)s WHERE message.id = %(id_1)s'),
+            'UPDATE message SET content=? WHERE message.id = ?')
+
+
+class ProfilerTestCase(TestCase):
+
+    config_name = 'TEST_PROFILER'
+    config_class = ProfilerTestConfig
+
+    def setUp(self):
+        config[self.config_name] = self.config_class
+        self.app = create_app(self.config_name)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        db.create_all()
+        self.endpoint = '/api/v1/messages'
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        del config[self.config_name]
+
+    def test_server_timing(self):
+        """
+        Responses report the time of each phase and of the SQL statements
+        """
+        response = self.client.post(self.endpoint, json={'content': 'aba'})
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        timings = server_timing(response)
+        for name in ('parse', 'validate', 'db', 'serialize', 'encode', 'total'):
+            self.assertIn(name, timings)
+            self.assertGreaterEqual(float(timings[name]['dur']), 0)
+
+        response = self.client.get(self.endpoint)
+        timings = server_timing(response)
+        self.assertEqual(timings['db']['desc'], '"1 queries"')
+        self.assertNotIn('validate', timings)
+
+    def test_disabled(self):
+        response = create_app('TEST').test_client().get('/api/v1/healthcheck')
+        self.assertNotIn('Server-Timing', response.headers)
+
+
+class SlowProfilerTestCase(ProfilerTestCase):
+
+    config_name = 'TEST_SLOW_PROFILER'
+    config_class = SlowProfilerTestConfig
+
+    def test_slow_log(self):
+        """
+        Slow requests and statements are logged as JSON with normalized statements
+        """
+        with self.assertLogs(self.app.logger, 'WARNING') as logs:
+            self.client.get(self.endpoint + '?ids=1,2,3')
+        records = [json.loads(output.split(':', 2)[2]) for output in logs.output]
+
+        slow_query, slow_request = records
+        self.assertEqual(slow_query['event'], 'slow_query')
+        self.assertIn('IN (...)', slow_query['statement'])
+        self.assertEqual(slow_request['event'], 'slow_request')
+        self.assertEqual(slow_request['route'], '/api/v1/messages')
+        self.assertEqual(slow_request['status'], HTTPStatus.OK)
+        self.assertEqual(slow_request['queries'][0]['statement'], slow_query['statement'])
+        self.assertEqual(slow_request['queries'][0]['count'], 1)
+        self.assertIn('db', slow_request['phases'])
@@ -0,0 +1,117 @@
+from http import HTTPStatus
+from unittest import TestCase
+from sqlalchemy import create_engine
+
+from app import db, create_app
+from app.config import config, TestConfig
+from app.routing import ReplicaPool
+
+
+class ReplicaTestConfig(TestConfig):
+    # a separate in-memory database standing for the replica
+    SQLALCHEMY_REPLICA_URIS = ['sqlite:///:memory:']
+    MESSAGE_CACHE_BACKEND = 'none'
+    READ_YOUR_WRITES_SECONDS = 0
+
+
+class ReadYourWritesTestConfig(ReplicaTestConfig):
+    READ_YOUR_WRITES_SECONDS = 5
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class ReplicaPoolTestCase(TestCase):
+
+    def test_round_robin_and_ejection(self):
+        engines = [create_engine('sqlite://'), create_engine('sqlite://')]
+        clock = FakeClock()
+        pool = ReplicaPool(engines, eject_seconds=10, clock=clock)
+        self.assertEqual([pool.next() for _ in range(4)], engines * 2)
+
+        pool.eject(engines[0])
+        self.assertEqual([pool.next() for _ in range(2)], [engines[1]] * 2)
+
+        pool.eject(engines[1])
+        self.assertIsNone(pool.next())
+
+        clock.now = 10
+        self.assertEqual([pool.next() for _ in range(2)], engines)
+
+    def test_eject_on_connection_error(self):
+        engine = create_engine('sqlite:////nonexistent/dir/replica.db')
+        pool = ReplicaPool([engine], eject_seconds=10)
+        with self.assertRaises(Exception):
+            engine.connect()
+        self.assertIsNone(pool.next())
+
+
+class ReplicaAppTestCase(TestCase):
+
+    config_name = 'TEST_REPLICA'
+    config_class = ReplicaTestConfig
+
+    def setUp(self):
+        config[self.config_name] = self.config_class
+        self.app = create_app(self.config_name)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        db.create_all()
+        self.replica = self.app.extensions['replicas'].engines[0]
+        db.metadata.create_all(bind=self.replica)
+        self.endpoint = '/api/v1/messages'
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        db.metadata.drop_all(bind=self.replica)
+        self.app_context.pop()
+        del config[self.config_name]
+
+
+class RoutingTestCase(ReplicaAppTestCase):
+
+    def test_reads_go_to_replica(self):
+        """
+        Writes go to the primary and the reads of GET requests to the replica
+        """
+        response = self.client.post(self.endpoint, json={'content': 'aba'})
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        id = response.get_json().get('message').get('id')
+
+        # not replicated yet
+        response = self.client.get('{}/{}'.format(self.endpoint, id))
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.client.get(self.endpoint)
+        self.assertEqual(response.get_json().get('messages'), [])
+
+        # writes that need a read stay on the primary
+        response = self.client.put('{}/{}'.format(self.endpoint, id), json={'content': 'abc'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class ReadYourWritesTestCase(ReplicaAppTestCase):
+
+    config_name = 'TEST_READ_YOUR_WRITES'
+    config_class = ReadYourWritesTestConfig
+
+    def test_read_your_writes(self):
+        """
+        The client that wrote reads from the primary for a while, others from the replica
+        """
+        response = self.client.post(self.endpoint, json={'content': 'aba'})
+        id = response.get_json().get('message').get('id')
+
+        response = self.client.get('{}/{}'.format(self.endpoint, id))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        other = self.app.test_client()
+        response = other.get('{}/{}'.format(self.endpoint, id))
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
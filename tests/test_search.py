@@ -0,0 +1,42 @@
+from unittest import TestCase
+from sqlalchemy.dialects import mysql, sqlite
+
+from app import search
+from app.repository import search_select, _select
+from app.exceptions import WebserviceException
+
+
+class SearchQueryTestCase(TestCase):
+
+    def test_parse_terms(self):
+        self.assertEqual(search.parse_terms('"red" apple* -pie OR'), ['red', 'apple', 'pie', 'OR'])
+        self.assertEqual(search.parse_terms('" * -'), [])
+        self.assertEqual(search.fts5_query(['red', 'OR']), '"red" "OR"')
+        self.assertEqual(search.mysql_query(['red', 'apple']), '+red +apple')
+
+    def test_search_select(self):
+        """
+        The search goes through the full-text index of each database, never LIKE
+        """
+        sql = str(search_select('sqlite', ['apple'], 0, 10).compile(dialect=sqlite.dialect()))
+        self.assertIn('message_fts MATCH', sql)
+        self.assertIn('ORDER BY bm25(message_fts)', sql)
+        self.assertNotIn('LIKE', sql)
+
+        sql = str(search_select('mysql', ['apple'], 0, 10).compile(dialect=mysql.dialect()))
+        self.assertIn('MATCH (message.content) AGAINST', sql)
+        self.assertNotIn('LIKE', sql)
+
+        with self.assertRaises(WebserviceException):
+            search_select('postgresql', ['apple'], 0, 10)
+
+    def test_select_fields(self):
+        """
+        Sparse fieldsets only select their columns, and the id
+        """
+        sql = str(_select(fields=('content',)).compile(dialect=sqlite.dialect()))
+        self.assertEqual(sql.split('\nFROM')[0].strip(), 'SELECT message.id, message.content')
+
+        sql = str(search_select('sqlite', ['apple'], 0, 10, fields=('palindrome',))
+                  .compile(dialect=sqlite.dialect()))
+        self.assertEqual(sql.split('\nFROM')[0].strip(), 'SELECT message.id, message.palindrome')
@@ -0,0 +1,52 @@
+from unittest import TestCase
+from datetime import datetime
+
+from app import db, create_app
+from app.models import Message
+from app.serializers import FastSerializer, MarshmallowSerializer, encode_object
+
+
+class SerializerTestCase(TestCase):
+
+    def setUp(self):
+        self.app = create_app('TEST')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_parity_with_marshmallow(self):
+        """
+        The fast serializer produces the same JSON as the marshmallow schema
+        """
+        contents = ['test', 'aba', 'quote " and \\\\ backslash', 'tab\tnew\nline',
+                    'unicode é 漢字 😀', '100%s', '</script>']
+        for content in contents:
+            m = Message()
+            m.content = content
+            m.add_or_update()
+        msgs = Message.query.all()
+        msgs.append(Message(id=99, content='not saved'))
+        msgs.append(Message(id=100, content='dates', palindrome=True,
+                            date_created=datetime(2021, 4, 20, 0, 33, 55, 68081),
+                            date_modified=datetime(2021, 4, 20, 0, 33, 55)))
+
+        fast, slow = FastSerializer(), MarshmallowSerializer()
+        for msg in msgs:
+            self.assertEqual(fast.dumps(msg), slow.dumps(msg))
+
+    def test_parity_with_only(self):
+        m = Message()
+        m.content = 'aba'
+        m.add_or_update()
+        only = ['id', 'content']
+        self.assertEqual(FastSerializer(only=only).dumps(m), MarshmallowSerializer(only=only).dumps(m))
+        self.assertEqual(FastSerializer(only=only).dumps(m), '{"content":"aba","id":1}')
+
+    def test_encode_object(self):
+        self.assertEqual(encode_object({'message': '{"id":1}'}, status=201, error='é'),
+                         '{"error":"\\u00e9","message":{"id":1},"status":201}')
@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+from app import create_app
+from app.config import config, TestConfig
+from app.startup import StartupProfile
+
+
+class ProfileTestConfig(TestConfig):
+    STARTUP_PROFILE = True
+    DB_MIGRATIONS = True
+
+
+class StartupTestCase(TestCase):
+
+    def tearDown(self):
+        config.pop('TEST_PROFILE', None)
+
+    def test_lazy_components(self):
+        app = create_app('TEST')
+        self.assertNotIn('migrate', app.extensions)
+        self.assertEqual(app.extensions['startup_profile'].steps, [])
+
+    def test_startup_profile(self):
+        config['TEST_PROFILE'] = ProfileTestConfig
+        app = create_app('TEST_PROFILE')
+        self.assertIn('migrate', app.extensions)
+
+        steps = dict(app.extensions['startup_profile'].steps)
+        for name in ('imports', 'db', 'migrate', 'cache', 'blueprints', 'swagger_ui'):
+            self.assertIn(name, steps)
+            self.assertGreaterEqual(steps[name], 0)
+
+        with self.assertLogs(app.logger, 'INFO') as logs:
+            app.extensions['startup_profile'].report(app.logger)
+        self.assertIn('total', logs.output[-1])
+
+    def test_disabled_profile(self):
+        profile = StartupProfile()
+        with profile.step('db'):
+            pass
+        self.assertEqual(profile.steps, [])